@@ -0,0 +1,496 @@
+"""
+Respaldo de la base de datos en streaming.
+
+El respaldo es un único archivo NDJSON comprimido con gzip que se genera
+recorriendo cada colección con un cursor y se envía por partes, así la
+memoria usada no depende del tamaño de la base de datos. Una línea JSON por
+registro:
+
+    {"type": "header", "format": "maribel-backup", "version": 1, "id": ..., "kind": "full", ...}
+    {"type": "document", "collection": "users", "data": {...}}
+    {"type": "deletion", "collection": "users", "id": "..."}      (solo incrementales)
+    ...
+    {"type": "manifest", "created_at": ..., "collections": {"users": {"count": 3, "deleted": 0, "sha256": "..."}, ...}}
+
+Las fechas se guardan como {"$date": "<ISO 8601>"}. El sha256 de cada
+colección se calcula sobre sus líneas de documento y de borrado tal como
+están en el archivo (con el salto de línea). El manifiesto va al final: un
+archivo sin manifiesto está incompleto.
+
+Un respaldo incremental solo incluye lo que cambió desde el respaldo anterior
+(created_at/updated_at posteriores y los borrados registrados en la colección
+deletions). Cada respaldo terminado queda anotado en la colección backups, que
+es de donde el incremental toma su base.
+
+La restauración lee los archivos por partes (comprimidos o no, y también los
+respaldos JSON antiguos): el respaldo completo se inserta en lotes en
+colecciones de staging y después se aplican los incrementales en orden. Solo
+cuando todo coincide con los manifiestos y los índices están construidos,
+cada colección de staging reemplaza a la real con un rename, así la base de
+datos en uso no queda vacía si la restauración falla a la mitad.
+
+También se puede generar desde la carpeta backend:
+
+    python backup.py                       # backup_<fecha>.ndjson.gz
+    python backup.py --incremental         # cambios desde el último respaldo
+    python backup.py --output respaldo.ndjson.gz
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import PyMongoError
+
+from indexes import DELETIONS_TTL_SECONDS, build_indexes
+from migrate_dates import convert_document_dates
+
+BACKUP_FORMAT = "maribel-backup"
+BACKUP_VERSION = 1
+BACKUP_MEDIA_TYPE = "application/gzip"
+
+# daily_sales and product_sales are derived from sales and rebuilt on restore
+BACKUP_COLLECTIONS = [
+    "users",
+    "categories",
+    "suppliers",
+    "products",
+    "customers",
+    "sales",
+    "inventory_movements",
+]
+
+# Fields that tell when a document last changed; sales and movements are
+# never modified after they are inserted
+CHANGE_FIELDS = {
+    "users": ["created_at", "updated_at"],
+    "categories": ["created_at", "updated_at"],
+    "suppliers": ["created_at", "updated_at"],
+    "products": ["created_at", "updated_at"],
+    "customers": ["created_at", "updated_at"],
+    "sales": ["created_at"],
+    "inventory_movements": ["created_at"],
+}
+CHANGE_OVERLAP = timedelta(minutes=5)
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+COMPRESSION_LEVEL = 6
+
+GZIP_MAGIC = b"\x1f\x8b"
+STAGING_PREFIX = "restore_staging_"
+
+
+class BackupError(Exception):
+    """The uploaded backup is invalid, incomplete or does not match its manifest."""
+
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot back up value of type {type(value).__name__}")
+
+
+def decode_object(obj: dict):
+    if len(obj) == 1 and "$date" in obj:
+        return datetime.fromisoformat(obj["$date"])
+    return obj
+
+
+def encode_line(record: dict) -> bytes:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=encode_value).encode("utf-8") + b"\n"
+
+
+def decode_line(line: bytes) -> dict:
+    return json.loads(line, object_hook=decode_object)
+
+
+def backup_filename(now: datetime = None, incremental: bool = False) -> str:
+    now = now or datetime.now(timezone.utc)
+    suffix = "_incremental" if incremental else ""
+    return f"backup_{now.strftime('%Y%m%d_%H%M%S')}{suffix}.ndjson.gz"
+
+
+def changed_since(collection_name: str, since: datetime) -> dict:
+    # Inserts are found by created_at; updated_at is set by every later change
+    fields = CHANGE_FIELDS[collection_name]
+    if len(fields) == 1:
+        return {fields[0]: {"$gt": since}}
+    return {"$or": [{field: {"$gt": since}} for field in fields]}
+
+
+async def find_backup_base(db, base_id: str = None) -> dict:
+    """The backup an incremental one builds on: the given one, or the latest."""
+    query = {"id": base_id} if base_id else {}
+    base = await db.backups.find_one(query, {"_id": 0}, sort=[("created_at", -1)])
+    if base is None:
+        raise BackupError("No previous backup to build on, take a full backup first")
+    created_at = base["created_at"]
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    # Older deletions have already expired from the deletions collection
+    if datetime.now(timezone.utc) - created_at > timedelta(seconds=DELETIONS_TTL_SECONDS):
+        raise BackupError("The previous backup is too old for an incremental backup, take a full backup")
+    return base
+
+
+async def iter_backup_lines(db, collections=BACKUP_COLLECTIONS, base: dict = None):
+    """Yield the encoded lines of a backup: header, documents (and deletions), manifest.
+
+    Without base it is a full backup. With base (a document from the backups
+    collection) only what changed since that backup started is included. The
+    manifest is recorded in the backups collection once the last line is out.
+    """
+    created_at = datetime.now(timezone.utc)
+    header = {"type": "header", "format": BACKUP_FORMAT, "version": BACKUP_VERSION,
+              "id": str(uuid.uuid4()), "kind": "incremental" if base else "full",
+              "parent_id": base["id"] if base else None, "since": None,
+              "created_at": created_at, "collections": list(collections)}
+    if base:
+        # Writes stamped just before the previous backup started may have
+        # committed after it read past them; a little overlap is harmless
+        # because restoring replaces documents by id
+        header["since"] = base["created_at"] - CHANGE_OVERLAP
+    yield encode_line(header)
+
+    manifest = {}
+    for name in collections:
+        checksum = hashlib.sha256()
+        count, deleted = 0, 0
+        # Not a point-in-time snapshot: writes made while the backup runs may
+        # or may not be included
+        if base:
+            cursor = db[name].find(changed_since(name, header["since"]), {"_id": 0})
+        else:
+            cursor = db[name].find({}, {"_id": 0}).sort("_id", 1)
+        async for document in cursor.batch_size(BATCH_SIZE):
+            line = encode_line({"type": "document", "collection": name, "data": document})
+            checksum.update(line)
+            count += 1
+            yield line
+        if base:
+            deletions = db.deletions.find({"collection": name, "deleted_at": {"$gt": header["since"]}}, {"_id": 0, "id": 1})
+            async for deletion in deletions.batch_size(BATCH_SIZE):
+                line = encode_line({"type": "deletion", "collection": name, "id": deletion["id"]})
+                checksum.update(line)
+                deleted += 1
+                yield line
+        manifest[name] = {"count": count, "deleted": deleted, "sha256": checksum.hexdigest()}
+
+    yield encode_line({"type": "manifest", "created_at": created_at, "collections": manifest})
+    record = {key: header[key] for key in ("id", "kind", "parent_id", "since", "created_at")}
+    record["collections"] = manifest
+    await db.backups.insert_one(record)
+
+
+async def gzip_chunks(lines, chunk_size: int = CHUNK_SIZE, level: int = COMPRESSION_LEVEL):
+    """Compress a stream of byte lines into gzip chunks of roughly chunk_size bytes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    pending = []
+    size = 0
+    async for line in lines:
+        compressed = compressor.compress(line)
+        if compressed:
+            pending.append(compressed)
+            size += len(compressed)
+        if size >= chunk_size:
+            yield b"".join(pending)
+            pending, size = [], 0
+    pending.append(compressor.flush())
+    yield b"".join(pending)
+
+
+def iter_backup(db, collections=BACKUP_COLLECTIONS, base: dict = None):
+    """Full (or, with base, incremental) backup as a stream of gzip chunks."""
+    return gzip_chunks(iter_backup_lines(db, collections, base))
+
+
+# ==================== RESTORE ====================
+
+async def iter_upload(file, chunk_size: int = CHUNK_SIZE):
+    """Read an UploadFile in chunks."""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def iter_lines(chunks):
+    """Split a stream of byte chunks into lines, gunzipping it on the fly when compressed."""
+    head = b""
+    decompressor = None
+    buffer = b""
+
+    def feed(data: bytes) -> bytes:
+        nonlocal decompressor
+        if decompressor is None:
+            return data
+        output = decompressor.decompress(data)
+        # Concatenated gzip members (e.g. files joined with cat)
+        while decompressor.eof and decompressor.unused_data:
+            rest = decompressor.unused_data
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            output += decompressor.decompress(rest)
+        return output
+
+    started = False
+    async for chunk in chunks:
+        if not started:
+            # The first two bytes tell gzip from plain text
+            head += chunk
+            if len(head) < 2:
+                continue
+            started = True
+            if head.startswith(GZIP_MAGIC):
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            chunk = head
+        buffer += feed(chunk)
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+
+    if not started:
+        buffer = head
+    elif decompressor is not None:
+        if not decompressor.eof:
+            raise BackupError("Truncated gzip file")
+        buffer += decompressor.flush()
+    if buffer:
+        yield buffer
+
+
+async def iter_backup_records(chunks):
+    """Yield (line, record) for each line of the backup.
+
+    Old JSON backups ({"users": [...], ..., "timestamp": ...}) have to be parsed
+    whole; their records come with line=None and a header of format "legacy".
+    """
+    lines = iter_lines(chunks)
+    first = None
+    async for line in lines:
+        if line.strip():
+            first = line
+            break
+    if first is None:
+        raise BackupError("The backup file is empty")
+
+    try:
+        header = decode_line(first)
+    except ValueError:
+        header = None
+    if isinstance(header, dict) and header.get("type") == "header":
+        if header.get("format") != BACKUP_FORMAT or header.get("version") != BACKUP_VERSION:
+            raise BackupError(f"Unsupported backup format: {header.get('format')} v{header.get('version')}")
+        yield first, header
+        async for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = decode_line(line)
+            except ValueError:
+                raise BackupError("Corrupt line in backup")
+            yield line, record
+        return
+
+    parts = [first]
+    async for line in lines:
+        parts.append(line)
+    try:
+        legacy = json.loads(b"".join(parts))
+    except ValueError:
+        raise BackupError("The file is not a valid backup")
+    if not isinstance(legacy, dict):
+        raise BackupError("The file is not a valid backup")
+    legacy.pop("timestamp", None)
+    yield None, {"type": "header", "format": "legacy", "collections": list(legacy)}
+    for name, documents in legacy.items():
+        for document in documents or []:
+            yield None, {"type": "document", "collection": name, "data": document}
+
+
+def check_collection_name(name) -> str:
+    if name not in BACKUP_COLLECTIONS:
+        raise BackupError(f"Unknown collection in backup: {name}")
+    return name
+
+
+async def drop_staging(db):
+    for name in await db.list_collection_names(filter={"name": {"$regex": f"^{STAGING_PREFIX}"}}):
+        await db.drop_collection(name)
+
+
+def verify_manifest(manifest: dict, totals: dict):
+    if manifest is None:
+        raise BackupError("The backup is incomplete (no manifest)")
+    expected = manifest.get("collections", {})
+    for name in set(expected) | set(totals):
+        entry = totals.get(name)
+        declared = expected.get(name)
+        if entry is None or declared is None or entry["count"] != declared.get("count") \
+                or entry["deleted"] != declared.get("deleted", 0):
+            raise BackupError(f"{name}: document count does not match the manifest")
+        if entry["sha256"].hexdigest() != declared.get("sha256"):
+            raise BackupError(f"{name}: checksum does not match the manifest")
+
+
+async def load_backup(db, chunks, parent: dict = None, batch_size: int = BATCH_SIZE):
+    """Load one backup file into the staging collections; returns its header and totals.
+
+    A full backup (parent None) is bulk inserted into empty staging
+    collections. An incremental one must follow parent and is applied on top:
+    documents replace the staged ones by id, deletions remove them.
+    """
+    header, manifest = None, None
+    totals = {}
+    batches = {}
+
+    async def flush(name: str):
+        if batches.get(name):
+            if parent is None:
+                await db[STAGING_PREFIX + name].insert_many(batches[name], ordered=False)
+            else:
+                await db[STAGING_PREFIX + name].bulk_write(batches[name], ordered=False)
+            batches[name] = []
+
+    async for line, record in iter_backup_records(chunks):
+        kind = record.get("type")
+        if kind == "header":
+            header = record
+            backup_kind = header.get("kind", "full")
+            if parent is None and backup_kind == "incremental":
+                raise BackupError("The first file must be a full backup")
+            if parent is not None and (backup_kind != "incremental" or header.get("parent_id") != parent.get("id")):
+                raise BackupError("Incremental backups must be given in order, each one right after the backup it is based on")
+            for name in header.get("collections", []):
+                totals.setdefault(check_collection_name(name), {"count": 0, "deleted": 0, "sha256": hashlib.sha256()})
+        elif kind in ("document", "deletion"):
+            if manifest is not None:
+                raise BackupError("Documents found after the manifest")
+            name = check_collection_name(record.get("collection"))
+            entry = totals.setdefault(name, {"count": 0, "deleted": 0, "sha256": hashlib.sha256()})
+            if line is not None:
+                entry["sha256"].update(line)
+            if kind == "deletion":
+                if parent is None:
+                    raise BackupError("Deletions are only valid in incremental backups")
+                entry["deleted"] += 1
+                batches.setdefault(name, []).append(DeleteOne({"id": record.get("id")}))
+            else:
+                document = record.get("data")
+                if not isinstance(document, dict):
+                    raise BackupError(f"Invalid document in {name}")
+                entry["count"] += 1
+                document.pop("_id", None)
+                # Old backups carry dates as ISO text
+                try:
+                    document = convert_document_dates(name, document)
+                except ValueError:
+                    raise BackupError(f"Invalid date in {name}")
+                if parent is None:
+                    batches.setdefault(name, []).append(document)
+                else:
+                    batches.setdefault(name, []).append(ReplaceOne({"id": document.get("id")}, document, upsert=True))
+            if len(batches[name]) >= batch_size:
+                await flush(name)
+        elif kind == "manifest":
+            manifest = record
+        else:
+            raise BackupError(f"Unknown record type in backup: {kind}")
+    for name in list(batches):
+        await flush(name)
+
+    if header["format"] != "legacy":
+        verify_manifest(manifest, totals)
+    return header, totals
+
+
+async def restore_backup(db, sources: list, batch_size: int = BATCH_SIZE, log=None) -> dict:
+    """Restore a full backup plus its chain of increments; returns the documents per collection.
+
+    sources are streams of byte chunks, one per file: the full backup first,
+    then each incremental backup in order. Every collection listed in the full
+    backup is replaced, collections not in it are left alone. Each collection
+    is swapped atomically, the set of them is not: a request served during the
+    swap can see some collections restored and others not yet.
+    """
+    if not sources:
+        raise BackupError("No backup given")
+
+    await drop_staging(db)
+    try:
+        header, restored = await load_backup(db, sources[0], batch_size=batch_size)
+        # Increments need the id index for their upserts, and a full backup
+        # loads faster without indexes, so they are built in between
+        existing = set(await db.list_collection_names())
+        for name in restored:
+            staging = STAGING_PREFIX + name
+            if staging not in existing:
+                await db.create_collection(staging)
+            try:
+                await build_indexes(db[staging], name)
+            except PyMongoError as e:
+                # e.g. duplicated ids or usernames in the backup
+                raise BackupError(f"{name}: could not build indexes: {e}")
+        if log:
+            log(f"respaldo completo {header.get('id', 'legacy')} cargado en staging")
+
+        for chunks in sources[1:]:
+            try:
+                header, totals = await load_backup(db, chunks, parent=header, batch_size=batch_size)
+            except PyMongoError as e:
+                raise BackupError(f"Could not apply incremental backup: {e}")
+            for name, entry in totals.items():
+                if name not in restored:
+                    raise BackupError(f"{name} is not in the full backup")
+            if log:
+                log(f"respaldo incremental {header['id']} aplicado")
+
+        counts = {name: await db[STAGING_PREFIX + name].count_documents({}) for name in restored}
+        for name in restored:
+            await db[STAGING_PREFIX + name].rename(name, dropTarget=True)
+    except BaseException:
+        await drop_staging(db)
+        raise
+
+    # The data no longer matches the recorded backups: the next incremental
+    # one needs a fresh full backup to build on
+    await db.backups.delete_many({})
+    return counts
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Respaldo de la base de datos")
+    parser.add_argument("--incremental", action="store_true", help="solo los cambios desde el último respaldo")
+    parser.add_argument("--base", help="id del respaldo en el que se basa el incremental (por defecto el último)")
+    parser.add_argument("--output", help="archivo de salida (por defecto backup_<fecha>.ndjson.gz)")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    db = client[os.environ['DB_NAME']]
+    output = Path(args.output or backup_filename(incremental=args.incremental))
+    try:
+        base = await find_backup_base(db, args.base) if args.incremental else None
+        with output.open("wb") as file:
+            async for chunk in iter_backup(db, base=base):
+                file.write(chunk)
+    except BackupError as e:
+        raise SystemExit(str(e))
+    finally:
+        client.close()
+    print(f"Respaldo guardado en {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
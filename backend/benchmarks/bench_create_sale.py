@@ -0,0 +1,123 @@
+"""
+Benchmark de create_sale: ventas por segundo según líneas por venta y
+cantidad de cajeros vendiendo al mismo tiempo, más una prueba de que el
+stock nunca queda negativo cuando varios cajeros venden el mismo producto.
+
+Requiere un MongoDB local. Usa una base de datos aparte (BENCH_DB_NAME,
+por defecto pharmacy_bench) que se borra al terminar:
+
+    cd backend
+    python benchmarks/bench_create_sale.py
+    python benchmarks/bench_create_sale.py --lines 1 10 50 --cashiers 1 8 32 --duration 5 --output bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+
+# common points server.py at the benchmark database, so it goes first
+from common import drop_bench_database, make_cashier, percentile, seed_products, server
+from fastapi import HTTPException
+from indexes import ensure_indexes
+from server import SaleCreate, SaleDetail
+
+
+def make_sale(products: list, lines: int, quantity: int = 1) -> SaleCreate:
+    details = [
+        SaleDetail(
+            product_id=p["id"],
+            product_name=p["name"],
+            quantity=quantity,
+            unit_price=p["price"],
+            subtotal=p["price"] * quantity,
+        )
+        for p in random.sample(products, lines)
+    ]
+    return SaleCreate(customer_name="Cliente General", details=details)
+
+
+async def run_case(products: list, lines: int, cashiers: int, duration: float) -> dict:
+    latencies = []
+    deadline = time.perf_counter() + duration
+
+    async def cashier(number: int):
+        user = make_cashier(number)
+        while time.perf_counter() < deadline:
+            sale = make_sale(products, lines)
+            started = time.perf_counter()
+            await server.create_sale(sale, current_user=user)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(cashier(n) for n in range(cashiers)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "lines": lines,
+        "cashiers": cashiers,
+        "sales": len(latencies),
+        "sales_per_second": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+    }
+
+
+async def check_oversell(cashiers: int, stock: int) -> dict:
+    # Every cashier keeps selling the same product until it runs out: exactly
+    # `stock` sales must succeed and the final stock must be zero
+    product = (await seed_products(1, stock))[0]
+    sold, refused = 0, 0
+
+    async def cashier(number: int):
+        nonlocal sold, refused
+        user = make_cashier(number)
+        for _ in range(stock):
+            try:
+                await server.create_sale(make_sale([product], 1), current_user=user)
+                sold += 1
+            except HTTPException:
+                refused += 1
+
+    await asyncio.gather(*(cashier(n) for n in range(cashiers)))
+    final_stock = (await server.db.products.find_one({"id": product["id"]}))["stock"]
+    return {"stock": stock, "sold": sold, "refused": refused, "final_stock": final_stock,
+            "ok": sold == stock and final_stock == 0}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de create_sale")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--cashiers", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--duration", type=float, default=3.0, help="segundos por caso")
+    parser.add_argument("--output", help="guarda los resultados en un archivo JSON")
+    args = parser.parse_args()
+
+    await ensure_indexes(server.db)
+    results = {"cases": [], "oversell": None}
+    try:
+        products = await seed_products(args.products, stock=10_000_000)
+        print(f"{'líneas':>7} {'cajeros':>8} {'ventas/s':>10} {'p50 ms':>8} {'p95 ms':>8}")
+        for lines in args.lines:
+            for cashiers in args.cashiers:
+                case = await run_case(products, lines, cashiers, args.duration)
+                results["cases"].append(case)
+                print(f"{lines:>7} {cashiers:>8} {case['sales_per_second']:>10} "
+                      f"{case['p50_ms']:>8} {case['p95_ms']:>8}")
+
+        results["oversell"] = await check_oversell(max(args.cashiers), stock=200)
+        print(f"\nSobreventa: {results['oversell']}")
+    finally:
+        await drop_bench_database()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0 if results["oversell"]["ok"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
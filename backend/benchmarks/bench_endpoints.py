@@ -0,0 +1,206 @@
+"""
+Micro-benchmarks de los endpoints más usados de server.py sobre datos
+sintéticos. Las peticiones pasan por la aplicación completa (validación de
+response_model y codificación JSON incluidas) con httpx y ASGITransport, sin
+red ni uvicorn:
+
+- create_sale con 1, 10 y 50 líneas
+- get_products con 1k, 10k y 100k productos
+- get_sales (primera página del listado de ventas)
+- get_dashboard_stats
+- cada reporte en JSON y exportado (export=true, Excel)
+- backup_database
+
+Cada caso se repite --rounds veces después de una vuelta de calentamiento y
+se informa el mínimo, la mediana y el p95. Las medianas se comparan contra
+benchmarks/baselines/bench_endpoints.json (u otro archivo con --baseline) y
+el script termina con error si alguna empeora más que --max-regression. La
+línea base se graba con --save-baseline en la máquina de referencia; sin
+ella (o si no tiene casos) el script termina con error antes de medir, y los
+casos nuevos que todavía no están en ella solo se informan. Requiere un
+MongoDB local (base de datos BENCH_DB_NAME, se borra al terminar):
+
+    cd backend
+    python benchmarks/bench_endpoints.py --save-baseline
+    python benchmarks/bench_endpoints.py --max-regression 0.2
+    python benchmarks/bench_endpoints.py --only report dashboard --rounds 20 --output endpoints.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+# common points server.py at the benchmark database, so it goes first
+from common import drop_bench_database, make_cashier, percentile, seed_products, seed_sales, server
+from indexes import ensure_indexes
+from pymongo import UpdateOne
+from rollups import rebuild_rollups
+
+PRODUCT_COUNTS = [1_000, 10_000, 100_000]
+SALE_LINES = [1, 10, 50]
+BASELINE_FILE = Path(__file__).resolve().parent / "baselines" / "bench_endpoints.json"
+
+
+async def measure(name: str, call, rounds: int) -> dict:
+    async def timed() -> float:
+        started = time.perf_counter()
+        # httpx reads the whole body, streamed exports and backups included
+        response = await call()
+        elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise RuntimeError(f"{name}: HTTP {response.status_code} {response.text[:200]}")
+        return elapsed
+
+    await timed()
+    timings = sorted([await timed() for _ in range(rounds)])
+    case = {
+        "name": name,
+        "rounds": rounds,
+        "min_ms": round(timings[0] * 1000, 2),
+        "median_ms": round(statistics.median(timings) * 1000, 2),
+        "p95_ms": round(percentile(timings, 0.95) * 1000, 2),
+    }
+    print(f"{name:<34} {case['min_ms']:>9} {case['median_ms']:>9} {case['p95_ms']:>9}")
+    return case
+
+
+async def set_expiration_dates(products: list, count: int):
+    # A slice of the catalog expires within the next 90 days
+    now = datetime.now(timezone.utc)
+    await server.db.products.bulk_write([
+        UpdateOne({"id": p["id"]}, {"$set": {"expiration_date": now + timedelta(days=random.randint(-10, 90))}})
+        for p in products[:count]
+    ])
+
+
+async def login_as(user) -> dict:
+    # Stored like any other user so get_current_user finds it
+    await server.db.users.insert_one(user.model_dump())
+    return {"Authorization": f"Bearer {server.create_access_token({'sub': user.id, 'role': user.role})}"}
+
+
+def sale_body(products: list, lines: int) -> dict:
+    details = [
+        {"product_id": p["id"], "product_name": p["name"], "quantity": 1,
+         "unit_price": p["price"], "subtotal": p["price"]}
+        for p in random.sample(products, lines)
+    ]
+    return {"customer_name": "Cliente General", "details": details, "payment_method": "efectivo"}
+
+
+def report_cases(http: httpx.AsyncClient) -> list:
+    today = datetime.now(timezone.utc).date()
+    month = {"start_date": (today - timedelta(days=30)).isoformat(), "end_date": today.isoformat()}
+    reports = {
+        "sales_report": ("/api/reports/sales-report", month),
+        "inventory_report": ("/api/reports/inventory-report", {}),
+        "expiring_products": ("/api/reports/expiring-products", {"days": 30}),
+        "top_selling": ("/api/reports/top-selling", {"limit": 10}),
+        "inventory_movements": ("/api/reports/inventory-movements", month),
+        "transactions": ("/api/reports/transactions", month),
+    }
+    return [
+        (f"report {name}{' export' if export else ''}",
+         lambda url=url, params=params, export=export: http.get(url, params={**params, "export": export}))
+        for name, (url, params) in reports.items()
+        for export in (False, True)
+    ]
+
+
+def selected(name: str, only) -> bool:
+    return not only or any(fragment in name for fragment in only)
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    previous_cases = {case["name"]: case for case in baseline.get("cases", [])}
+    regressions = []
+    for case in results["cases"]:
+        previous = previous_cases.get(case["name"], {}).get("median_ms")
+        if not previous:
+            print(f"sin línea base: {case['name']}")
+        elif case["median_ms"] > previous * (1 + max_regression):
+            regressions.append(f"{case['name']}: {previous} -> {case['median_ms']} ms "
+                               f"(+{(case['median_ms'] / previous - 1) * 100:.0f}%)")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de los endpoints")
+    parser.add_argument("--rounds", type=int, default=10, help="repeticiones por caso")
+    parser.add_argument("--sales", type=int, default=20_000, help="ventas sintéticas para reportes y dashboard")
+    parser.add_argument("--only", nargs="+", help="solo los casos cuyo nombre contenga alguno de estos textos")
+    parser.add_argument("--output", help="guarda los resultados en un archivo JSON")
+    parser.add_argument("--baseline", default=str(BASELINE_FILE), help="resultados contra los que comparar")
+    parser.add_argument("--save-baseline", action="store_true", help="graba los resultados como línea base")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="empeoramiento tolerado (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    baseline_path = Path(args.baseline)
+    baseline = None
+    if not args.save_baseline:
+        baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+        if not baseline.get("cases"):
+            # Nothing to compare against would let every regression pass
+            print(f"sin línea base en {baseline_path}: grabarla con --save-baseline")
+            return 1
+
+    await ensure_indexes(server.db)
+    results = {"sales": args.sales, "rounds": args.rounds, "cases": []}
+    print(f"{'caso':<34} {'min ms':>9} {'mediana':>9} {'p95 ms':>9}")
+
+    async def run(name, call):
+        if selected(name, args.only):
+            results["cases"].append(await measure(name, call, args.rounds))
+
+    try:
+        cashier = await login_as(make_cashier(0))
+        admin = await login_as(make_cashier(1).model_copy(update={"role": "administrador"}))
+        products = await seed_products(1000, stock=10_000_000)
+        await set_expiration_dates(products, 200)
+        await seed_sales(args.sales, products)
+        await rebuild_rollups(server.db)
+
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers=cashier, timeout=None) as http:
+            # create_sale also leaves the inventory movements the reports read
+            for lines in SALE_LINES:
+                await run(f"create_sale {lines} lines",
+                          lambda lines=lines: http.post("/api/sales", json=sale_body(products, lines)))
+            await run("get_sales", lambda: http.get("/api/sales"))
+            await run("get_dashboard_stats", lambda: http.get("/api/dashboard/stats"))
+            for name, call in report_cases(http):
+                await run(name, call)
+            await run("backup_database", lambda: http.get("/api/database/backup", headers=admin))
+
+            # Last: reseeding replaces the catalog the other cases use
+            for count in PRODUCT_COUNTS:
+                name = f"get_products {count // 1000}k"
+                if not selected(name, args.only):
+                    continue
+                await seed_products(count, stock=100)
+                await run(name, lambda: http.get("/api/products"))
+    finally:
+        await drop_bench_database()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"línea base grabada en {baseline_path}")
+        return 0
+    regressions = compare(results, baseline, args.max_regression)
+    for regression in regressions:
+        print(f"REGRESIÓN {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,123 @@
+"""
+Micro-benchmark de la serialización de listados: costo por fila de la ruta
+normal de FastAPI (response_model) contra FAST_JSON=validate y
+FAST_JSON=trusted, con productos y ventas sintéticos. No usa MongoDB.
+
+    cd backend
+    python benchmarks/bench_json.py
+    python benchmarks/bench_json.py --rows 1000 10000 --repeat 20 --output json.json
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# common points server.py at the benchmark database, so it goes first
+from common import server  # noqa: F401
+from serialization import FastJSON, list_adapter, model_projection
+from server import Product, Sale
+
+
+def product_documents(count: int) -> list:
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Producto {i:05d}",
+            "description": "Producto de prueba",
+            "category_id": str(uuid.uuid4()),
+            "supplier_id": str(uuid.uuid4()),
+            "price": 12.5,
+            "cost": 7.25,
+            "stock": 100 + i,
+            "min_stock": 10,
+            "expiration_date": created + timedelta(days=365),
+            "barcode": f"{i:013d}",
+            "active": True,
+            "created_at": created + timedelta(minutes=i),
+            "updated_at": None,
+        }
+        for i in range(count)
+    ]
+
+
+def sale_documents(count: int) -> list:
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    details = [
+        {"product_id": str(uuid.uuid4()), "product_name": f"Producto {n}", "quantity": 2, "unit_price": 5.0, "subtotal": 10.0}
+        for n in range(3)
+    ]
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "customer_id": None,
+            "customer_name": "Cliente General",
+            "user_id": str(uuid.uuid4()),
+            "user_name": "Cajero",
+            "details": details,
+            "subtotal": 30.0,
+            "tax": 0.0,
+            "discount": 0.0,
+            "total": 30.0,
+            "payment_method": "efectivo",
+            "created_at": created + timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+def fastapi_default(items: list, model) -> bytes:
+    # What FastAPI does with response_model=List[model]: validate, convert to
+    # JSON-compatible Python, then json.dumps in JSONResponse
+    adapter = list_adapter(model)
+    content = adapter.dump_python(adapter.validate_python(items), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def time_per_row(encode, items: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode(items)
+        best = min(best, time.perf_counter() - started)
+    return best / len(items) * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo por fila de la serialización de listados")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="guarda los resultados en un archivo JSON")
+    args = parser.parse_args()
+
+    validate, trusted = FastJSON("validate"), FastJSON("trusted")
+    paths = {
+        "fastapi": fastapi_default,
+        "validate": lambda items, model: validate.response(items, model).body,
+        "trusted": lambda items, model: trusted.response(items, model).body,
+    }
+    results = []
+    print(f"{'modelo':>8} {'filas':>7} " + " ".join(f"{name + ' µs':>12}" for name in paths) + f" {'mejora':>8}")
+    for model, make in ((Product, product_documents), (Sale, sale_documents)):
+        for rows in args.rows:
+            documents = make(rows)
+            # The trusted path only gets the projected fields from Mongo
+            projected = [{key: doc[key] for key in model_projection(model) if key in doc} for doc in documents]
+            case = {"model": model.__name__, "rows": rows}
+            for name, encode in paths.items():
+                items = projected if name == "trusted" else documents
+                case[f"{name}_us_per_row"] = round(time_per_row(lambda batch: encode(batch, model), items, args.repeat), 3)
+            case["speedup"] = round(case["fastapi_us_per_row"] / case["trusted_us_per_row"], 1)
+            results.append(case)
+            print(f"{model.__name__:>8} {rows:>7} " + " ".join(f"{case[f'{name}_us_per_row']:>12}" for name in paths)
+                  + f" {case['speedup']:>7}x")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Latencia del punto de venta durante una avalancha de logins.
+
+Mide la búsqueda de productos del POS sin carga y mientras muchos usuarios
+inician sesión a la vez. Con bcrypt en el pool de hilos la latencia del POS
+debe mantenerse estable; con --workers 0 (bcrypt dentro del event loop, el
+comportamiento anterior) se dispara.
+
+Requiere un MongoDB local (base de datos BENCH_DB_NAME, se borra al terminar):
+
+    cd backend
+    python benchmarks/bench_login_storm.py
+    python benchmarks/bench_login_storm.py --workers 0
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+parser = argparse.ArgumentParser(description="Latencia del POS durante una avalancha de logins")
+parser.add_argument("--workers", type=int, default=None, help="PASSWORD_HASH_WORKERS (0 = en el event loop)")
+parser.add_argument("--logins", type=int, default=200, help="logins simultáneos durante la avalancha")
+parser.add_argument("--duration", type=float, default=3.0, help="segundos de medición sin carga")
+parser.add_argument("--output", help="guarda los resultados en un archivo JSON")
+args = parser.parse_args()
+if args.workers is not None:
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+# Enough room in the queue for the whole storm; rejections are measured apart
+os.environ.setdefault("PASSWORD_HASH_MAX_PENDING", str(args.logins))
+
+# common points server.py at the benchmark database, so it goes first
+from common import drop_bench_database, make_cashier, percentile, seed_products, server  # noqa: E402
+from fastapi import HTTPException  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+from server import UserLogin  # noqa: E402
+
+
+async def pos_latencies(stop: asyncio.Event) -> list:
+    user = make_cashier(0)
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await server.search_products(q="producto 01", limit=12, in_stock=True, current_user=user)
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+    return sorted(latencies)
+
+
+def summary(latencies: list) -> dict:
+    return {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def main():
+    await ensure_indexes(server.db)
+    results = {"password_hash_workers": server.password_hasher.workers}
+    try:
+        await seed_products(5000, stock=1000)
+        await server.db.users.delete_many({})
+        await server.db.users.insert_one({
+            **make_cashier(1).model_dump(),
+            "username": "storm",
+            "password_hash": server.pwd_context.hash("storm123"),
+        })
+
+        stop = asyncio.Event()
+        baseline = asyncio.create_task(pos_latencies(stop))
+        await asyncio.sleep(args.duration)
+        stop.set()
+        results["pos_idle"] = summary(await baseline)
+
+        stop = asyncio.Event()
+        during_storm = asyncio.create_task(pos_latencies(stop))
+        failed = 0
+
+        async def login():
+            nonlocal failed
+            try:
+                await server.login(UserLogin(username="storm", password="storm123"))
+            except HTTPException:
+                failed += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(args.logins)))
+        storm_seconds = time.perf_counter() - started
+        stop.set()
+        results["pos_during_storm"] = summary(await during_storm)
+        results["storm"] = {
+            "logins": args.logins,
+            "failed": failed,
+            "seconds": round(storm_seconds, 2),
+            "logins_per_second": round(args.logins / storm_seconds, 1),
+        }
+        results["password_hashing"] = server.password_hasher.stats()
+    finally:
+        await drop_bench_database()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,74 @@
+"""
+Benchmark de los formatos de exportación de reportes: filas por segundo,
+tamaño del archivo y memoria máxima de Python al exportar el reporte de
+ventas (una fila por línea de venta) en xlsx, csv, ndjson y parquet.
+
+Requiere un MongoDB local (base de datos BENCH_DB_NAME, se borra al terminar)
+y pyarrow para parquet (pip install -r requirements-parquet.txt):
+
+    cd backend
+    python benchmarks/bench_report_formats.py
+    python benchmarks/bench_report_formats.py --sales 200000 --formats csv ndjson --output formats.json
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+# common points server.py at the benchmark database, so it goes first
+from common import drop_bench_database, make_cashier, seed_products, seed_sales, server
+from indexes import ensure_indexes
+
+
+async def export_once(output_format: str, user) -> dict:
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = await server.get_sales_report(
+        start_date=None, end_date=None, export=False, output_format=output_format,
+        limit=None, after=None, current_user=user,
+    )
+    size = 0
+    async for chunk in response.body_iterator:
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": elapsed, "bytes": size, "peak_mb": round(peak / 1024 / 1024, 1)}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de formatos de exportación")
+    parser.add_argument("--sales", type=int, default=50_000)
+    parser.add_argument("--lines", type=int, default=3, help="líneas por venta (filas por venta en el reporte)")
+    parser.add_argument("--formats", nargs="+", default=["xlsx", "csv", "ndjson", "parquet"])
+    parser.add_argument("--output", help="guarda los resultados en un archivo JSON")
+    args = parser.parse_args()
+
+    await ensure_indexes(server.db)
+    user = make_cashier(0)
+    results = {"sales": args.sales, "rows": 0, "formats": []}
+    try:
+        products = await seed_products(1000, stock=1000)
+        results["rows"] = await seed_sales(args.sales, products, args.lines)
+        print(f"{results['rows']} filas")
+        print(f"{'formato':>8} {'segundos':>9} {'filas/s':>10} {'MB':>8} {'pico MB':>8}")
+        for output_format in args.formats:
+            case = await export_once(output_format, user)
+            case["format"] = output_format
+            case["rows_per_second"] = round(results["rows"] / case["seconds"])
+            case["seconds"] = round(case["seconds"], 2)
+            results["formats"].append(case)
+            print(f"{output_format:>8} {case['seconds']:>9} {case['rows_per_second']:>10} "
+                  f"{case['bytes'] / 1024 / 1024:>8.1f} {case['peak_mb']:>8}")
+    finally:
+        await drop_bench_database()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,178 @@
+"""
+Benchmark de arranque: tiempo de importación de server.py, memoria (RSS) del
+proceso después de importar, tiempo hasta la primera respuesta de un worker
+de uvicorn y su RSS. Cada medición se hace en un proceso nuevo.
+
+Requiere un MongoDB local (base de datos BENCH_DB_NAME, se borra al terminar).
+Con --baseline compara contra resultados guardados y termina con error si
+algún valor empeora más que --max-regression:
+
+    cd backend
+    python benchmarks/bench_startup.py --output startup.json
+    python benchmarks/bench_startup.py --baseline startup.json --max-regression 0.25
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Runs in a fresh interpreter; prints the import time and the RSS in MB
+IMPORT_PROBE = """
+import time
+started = time.perf_counter()
+import server
+elapsed = time.perf_counter() - started
+import json, sys
+from pathlib import Path
+rss = next(int(line.split()[1]) for line in Path("/proc/self/status").read_text().splitlines() if line.startswith("VmRSS:"))
+heavy = sorted(name for name in ("pandas", "numpy", "xlsxwriter", "pyarrow", "openpyxl") if name in sys.modules)
+print(json.dumps({"import_seconds": elapsed, "rss_mb": rss / 1024, "heavy_modules": heavy}))
+"""
+
+
+def bench_env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    env["DB_NAME"] = env.get("BENCH_DB_NAME", "pharmacy_bench")
+    return env
+
+
+def rss_mb(pid: int) -> float:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import() -> dict:
+    result = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, env=bench_env(),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(count: int = 10) -> list:
+    """Modules imported directly by server.py, by cumulative import time (-X importtime)."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import server"], cwd=BACKEND_DIR,
+                            env=bench_env(), capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Names are indented two spaces per nesting level; server's own
+        # imports are one level down
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            modules.append((int(cumulative), name.strip()))
+    modules.sort(reverse=True)
+    return [{"module": name, "ms": round(us / 1000, 1)} for us, name in modules[:count]]
+
+
+def measure_first_request(timeout: float = 60.0) -> dict:
+    """Start one uvicorn worker and time it until the first request is answered."""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=bench_env(),
+    )
+    try:
+        # Unknown user: one indexed lookup and a 401, no bcrypt involved
+        body = json.dumps({"username": "bench-startup", "password": "-"}).encode()
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited before answering")
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError("no response from uvicorn")
+            request = urllib.request.Request(f"http://127.0.0.1:{port}/api/auth/login", data=body,
+                                             headers={"Content-Type": "application/json"})
+            try:
+                urllib.request.urlopen(request, timeout=2)
+                break
+            except urllib.error.HTTPError:
+                break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+        return {"first_request_seconds": time.perf_counter() - started, "worker_rss_mb": rss_mb(process.pid)}
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def drop_bench_database():
+    subprocess.run([sys.executable, "-c", (
+        "import os; from pymongo import MongoClient; "
+        "MongoClient(os.environ['MONGO_URL']).drop_database(os.environ['DB_NAME'])"
+    )], cwd=BACKEND_DIR, env=bench_env(), check=False)
+
+
+def summarize(runs: list, keys: list) -> dict:
+    return {key: round(statistics.median(run[key] for run in runs), 3) for key in keys}
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> list:
+    regressions = []
+    for key, value in results["median"].items():
+        previous = baseline.get("median", {}).get(key)
+        if previous and value > previous * (1 + max_regression):
+            regressions.append(f"{key}: {previous} -> {value} (+{(value / previous - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque del backend")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="guarda los resultados en un archivo JSON")
+    parser.add_argument("--baseline", help="resultados anteriores contra los que comparar")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="empeoramiento tolerado (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    try:
+        imports = [measure_import() for _ in range(args.runs)]
+        requests = [measure_first_request() for _ in range(args.runs)]
+    finally:
+        drop_bench_database()
+
+    results = {
+        "median": {
+            **summarize(imports, ["import_seconds", "rss_mb"]),
+            **summarize(requests, ["first_request_seconds", "worker_rss_mb"]),
+        },
+        "heavy_modules": imports[0]["heavy_modules"],
+        "slowest_imports": slowest_imports(),
+    }
+    median = results["median"]
+    print(f"import server:        {median['import_seconds'] * 1000:.0f} ms, RSS {median['rss_mb']:.1f} MB")
+    print(f"primera respuesta:    {median['first_request_seconds'] * 1000:.0f} ms, RSS del worker {median['worker_rss_mb']:.1f} MB")
+    print(f"módulos pesados cargados al importar: {', '.join(results['heavy_modules']) or 'ninguno'}")
+    for entry in results["slowest_imports"]:
+        print(f"  {entry['module']:<24} {entry['ms']:>8} ms")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESIÓN {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
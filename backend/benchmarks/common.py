@@ -0,0 +1,104 @@
+"""
+Utilidades compartidas por los benchmarks: configuran una base de datos
+aparte antes de importar server.py y generan datos sintéticos.
+"""
+
+import os
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ["DB_NAME"] = os.environ.get("BENCH_DB_NAME", "pharmacy_bench")
+
+import server  # noqa: E402
+from server import User  # noqa: E402
+
+
+def make_cashier(number: int) -> User:
+    return User(
+        username=f"cajero{number}",
+        email=f"cajero{number}@bench.maribel.com",
+        password_hash="-",
+        role="vendedor",
+        full_name=f"Cajero {number}",
+    )
+
+
+async def seed_products(count: int, stock: int) -> list:
+    await server.db.products.delete_many({})
+    products = [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Producto {i:05d}",
+            "description": "Producto de prueba",
+            "category_id": "bench",
+            "supplier_id": "bench",
+            "price": round(random.uniform(1, 50), 2),
+            "cost": 1.0,
+            "stock": stock,
+            "min_stock": 10,
+            "expiration_date": None,
+            "barcode": f"{i:013d}",
+            "active": True,
+            "created_at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+            "search_name": f"producto {i:05d}",
+        }
+        for i in range(count)
+    ]
+    for start in range(0, count, 10_000):
+        await server.db.products.insert_many(products[start:start + 10_000])
+    return [{"id": p["id"], "name": p["name"], "price": p["price"]} for p in products]
+
+
+async def seed_sales(count: int, products: list, lines: int = 3, days: int = 365) -> int:
+    """Insert `count` sales spread over the last `days` days; returns the number of sale lines."""
+    await server.db.sales.delete_many({})
+    now = datetime.now(timezone.utc)
+    total_lines = 0
+    for start in range(0, count, 10_000):
+        batch = []
+        for _ in range(min(10_000, count - start)):
+            details = [
+                {
+                    "product_id": p["id"],
+                    "product_name": p["name"],
+                    "quantity": 1,
+                    "unit_price": p["price"],
+                    "subtotal": p["price"],
+                }
+                for p in random.sample(products, lines)
+            ]
+            subtotal = round(sum(d["subtotal"] for d in details), 2)
+            batch.append({
+                "id": str(uuid.uuid4()),
+                "customer_id": None,
+                "customer_name": "Cliente General",
+                "user_id": "bench",
+                "user_name": "Cajero 0",
+                "details": details,
+                "subtotal": subtotal,
+                "tax": 0.0,
+                "discount": 0.0,
+                "total": subtotal,
+                "payment_method": random.choice(["efectivo", "tarjeta", "transferencia"]),
+                "created_at": now - timedelta(seconds=random.randint(0, days * 86400)),
+            })
+        total_lines += len(batch) * lines
+        await server.db.sales.insert_many(batch)
+    return total_lines
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def drop_bench_database():
+    await server.client.drop_database(os.environ["DB_NAME"])
+    server.client.close()
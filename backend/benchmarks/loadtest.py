@@ -0,0 +1,222 @@
+"""
+Prueba de carga local del flujo del punto de venta.
+
+Levanta la API con uvicorn contra un MongoDB local (base de datos
+BENCH_DB_NAME, se borra al terminar), carga datos sintéticos y la somete a
+muchos clientes async concurrentes que mezclan login, búsqueda de productos,
+ventas, consultas al dashboard y exportación de reportes. Informa p50/p95/p99
+y peticiones por segundo por endpoint, y guarda los resultados en JSON para
+comparar entre commits:
+
+    cd backend
+    python benchmarks/loadtest.py --clients 50 --duration 30 --output carga.json
+    python benchmarks/loadtest.py --mix backoffice --workers 4 --compare carga.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import httpx
+
+# common points server.py at the benchmark database, so it goes first
+from common import drop_bench_database, percentile, seed_products, server
+from indexes import ensure_indexes
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Relative weight of each action per mix
+MIXES = {
+    # Cashiers: mostly searching and selling, the dashboard open on one screen
+    "pos": {"login": 1, "search": 20, "create_sale": 8, "dashboard": 2, "report_export": 0.2},
+    # Back office: dashboards and reports while the registers keep selling
+    "backoffice": {"login": 1, "search": 5, "create_sale": 3, "dashboard": 8, "report_export": 2},
+}
+
+CASHIER = {"username": "vendedor", "password": "vendedor123"}
+SEARCH_TERMS = ["producto 0", "producto 01", "producto 12", "producto 3", "producto 004", "prod"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(port: int, workers: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=dict(os.environ),
+    )
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as http:
+        deadline = time.perf_counter() + 60
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                await http.post("/api/auth/login", json={"username": "-", "password": "-"})
+                return process
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start in 60 seconds")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def record(self, name: str, seconds: float, ok: bool):
+        self.latencies.setdefault(name, []).append(seconds)
+        if not ok:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        endpoints = {}
+        for name, values in sorted(self.latencies.items()):
+            values.sort()
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": self.errors.get(name, 0),
+                "rps": round(len(values) / elapsed, 1),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+            }
+        total = sum(entry["requests"] for entry in endpoints.values())
+        return {"elapsed_seconds": round(elapsed, 2), "total_rps": round(total / elapsed, 1), "endpoints": endpoints}
+
+
+class VirtualClient:
+    def __init__(self, http: httpx.AsyncClient, recorder: Recorder, products: list, mix: dict, think: float):
+        self.http = http
+        self.recorder = recorder
+        self.products = products
+        self.actions = list(mix)
+        self.weights = [mix[action] for action in self.actions]
+        self.think = think
+        self.headers = {}
+
+    async def call(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, headers=self.headers, **kwargs)
+            # Exports stream their body; the time includes reading all of it
+            await response.aread()
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.recorder.record(name, time.perf_counter() - started, ok)
+        return response
+
+    async def login(self):
+        response = await self.call("login", "POST", "/api/auth/login", json=CASHIER)
+        if response is not None and response.status_code == 200:
+            self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def search(self):
+        await self.call("search", "GET", "/api/products/search",
+                        params={"q": random.choice(SEARCH_TERMS), "in_stock": True, "limit": 12})
+
+    async def create_sale(self):
+        details = [
+            {"product_id": p["id"], "product_name": p["name"], "quantity": 1,
+             "unit_price": p["price"], "subtotal": p["price"]}
+            for p in random.sample(self.products, random.randint(1, 5))
+        ]
+        await self.call("create_sale", "POST", "/api/sales",
+                        json={"customer_name": "Cliente General", "details": details, "payment_method": "efectivo"})
+
+    async def dashboard(self):
+        await self.call("dashboard", "GET", "/api/dashboard/stats")
+
+    async def report_export(self):
+        today = datetime.now(timezone.utc).date()
+        await self.call("report_export", "GET", "/api/reports/sales-report",
+                        params={"start_date": (today - timedelta(days=7)).isoformat(),
+                                "end_date": today.isoformat(), "format": "csv"})
+
+    async def run(self, deadline: float):
+        await self.login()
+        while time.perf_counter() < deadline:
+            action = random.choices(self.actions, self.weights)[0]
+            await getattr(self, action)()
+            if self.think:
+                await asyncio.sleep(random.expovariate(1 / self.think))
+
+
+def compare(current: dict, previous: dict):
+    print("\nComparación con la corrida anterior (p95 ms / rps):")
+    for name, entry in current["endpoints"].items():
+        before = previous.get("summary", {}).get("endpoints", {}).get(name)
+        if not before:
+            continue
+        print(f"  {name:<14} p95 {before['p95_ms']:>8} -> {entry['p95_ms']:<8}  rps {before['rps']:>7} -> {entry['rps']}")
+
+
+def git_commit() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True)
+    return result.stdout.strip() or "unknown"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del punto de venta")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="pos")
+    parser.add_argument("--clients", type=int, default=50, help="clientes concurrentes")
+    parser.add_argument("--duration", type=float, default=30.0, help="segundos de carga")
+    parser.add_argument("--think", type=float, default=0.0, help="pausa media entre acciones, en segundos")
+    parser.add_argument("--workers", type=int, default=1, help="workers de uvicorn")
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--output", help="guarda los resultados en un archivo JSON")
+    parser.add_argument("--compare", help="resultados anteriores para comparar")
+    args = parser.parse_args()
+
+    await ensure_indexes(server.db)
+    await server.seed_database()
+    products = await seed_products(args.products, stock=10_000_000)
+    port = free_port()
+    process = await start_server(port, args.workers)
+    recorder = Recorder()
+    try:
+        limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as http:
+            clients = [VirtualClient(http, recorder, products, MIXES[args.mix], args.think) for _ in range(args.clients)]
+            started = time.perf_counter()
+            await asyncio.gather(*(client.run(started + args.duration) for client in clients))
+            elapsed = time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        await drop_bench_database()
+
+    summary = recorder.summary(elapsed)
+    print(f"mix {args.mix}, {args.clients} clientes, {args.workers} workers: {summary['total_rps']} peticiones/s")
+    print(f"{'endpoint':<14} {'peticiones':>10} {'errores':>8} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, entry in summary["endpoints"].items():
+        print(f"{name:<14} {entry['requests']:>10} {entry['errors']:>8} {entry['rps']:>8} "
+              f"{entry['p50_ms']:>8} {entry['p95_ms']:>8} {entry['p99_ms']:>8}")
+
+    results = {
+        "commit": git_commit(),
+        "date": datetime.now(timezone.utc).isoformat(),
+        "config": vars(args),
+        "summary": summary,
+    }
+    if args.compare:
+        compare(summary, json.loads(Path(args.compare).read_text()))
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -13,6 +13,9 @@ from passlib.context import CryptContext
 from datetime import datetime, timezone
 import uuid
 
+from rollups import rebuild_rollups
+from search_names import backfill_search_names
+
 # Configuración
 MONGO_URL = "mongodb://localhost:27017"
 DB_NAME = "pharmacy_db"
@@ -63,7 +66,7 @@ async def crear_datos():
             "role": "administrador",
             "full_name": "Administrador Sistema",
             "active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -73,7 +76,7 @@ async def crear_datos():
             "role": "vendedor",
             "full_name": "Juan Pérez",
             "active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -83,7 +86,7 @@ async def crear_datos():
             "role": "consulta",
             "full_name": "María García",
             "active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
     ]
     
@@ -219,6 +222,17 @@ async def crear_datos():
     await db.customers.insert_many(clientes)
     print("   ✓ 2 clientes creados")
     
+    # Nombre sin acentos que usa /api/products/search
+    await backfill_search_names(db)
+    
+    # Los catálogos cambiaron: invalida los ETags que tengan los navegadores
+    await db.collection_versions.delete_many({})
+    
+    # Resúmenes del dashboard recalculados a partir de las ventas actuales
+    await db.daily_sales.delete_many({})
+    await db.product_sales.delete_many({})
+    await rebuild_rollups(db)
+    
     # Cerrar conexión
     client.close()
     
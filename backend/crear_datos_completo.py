@@ -8,6 +8,9 @@ import bcrypt
 from datetime import datetime, timezone
 import uuid
 
+from rollups import rebuild_rollups
+from search_names import backfill_search_names
+
 MONGO_URL = "mongodb://localhost:27017"
 DB_NAME = "pharmacy_db"
 
@@ -44,7 +47,7 @@ async def crear_datos():
             "role": "administrador",
             "full_name": "Administrador Sistema",
             "active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -54,7 +57,7 @@ async def crear_datos():
             "role": "vendedor",
             "full_name": "Juan Perez",
             "active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -64,7 +67,7 @@ async def crear_datos():
             "role": "consulta",
             "full_name": "Maria Garcia",
             "active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
     ]
     await db.users.insert_many(usuarios)
@@ -73,11 +76,11 @@ async def crear_datos():
     # ========== CATEGORIAS ==========
     print("\n[2/6] Creando categorias...")
     categorias = [
-        {"id": "cat-001", "name": "Analgesicos", "description": "Medicamentos para aliviar el dolor", "created_at": datetime.now(timezone.utc).isoformat()},
-        {"id": "cat-002", "name": "Antibioticos", "description": "Medicamentos para combatir infecciones", "created_at": datetime.now(timezone.utc).isoformat()},
-        {"id": "cat-003", "name": "Vitaminas", "description": "Suplementos vitaminicos", "created_at": datetime.now(timezone.utc).isoformat()},
-        {"id": "cat-004", "name": "Antiinflamatorios", "description": "Medicamentos para reducir inflamacion", "created_at": datetime.now(timezone.utc).isoformat()},
-        {"id": "cat-005", "name": "Cardiovasculares", "description": "Medicamentos para el corazon", "created_at": datetime.now(timezone.utc).isoformat()},
+        {"id": "cat-001", "name": "Analgesicos", "description": "Medicamentos para aliviar el dolor", "created_at": datetime.now(timezone.utc)},
+        {"id": "cat-002", "name": "Antibioticos", "description": "Medicamentos para combatir infecciones", "created_at": datetime.now(timezone.utc)},
+        {"id": "cat-003", "name": "Vitaminas", "description": "Suplementos vitaminicos", "created_at": datetime.now(timezone.utc)},
+        {"id": "cat-004", "name": "Antiinflamatorios", "description": "Medicamentos para reducir inflamacion", "created_at": datetime.now(timezone.utc)},
+        {"id": "cat-005", "name": "Cardiovasculares", "description": "Medicamentos para el corazon", "created_at": datetime.now(timezone.utc)},
     ]
     await db.categories.insert_many(categorias)
     print("   OK - 5 categorias creadas")
@@ -92,7 +95,7 @@ async def crear_datos():
             "phone": "555-0101", 
             "email": "ventas@farma.com", 
             "address": "Av. Principal 123",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": "sup-002", 
@@ -101,7 +104,7 @@ async def crear_datos():
             "phone": "555-0102", 
             "email": "contacto@labmedicos.com", 
             "address": "Calle Salud 456",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
     ]
     await db.suppliers.insert_many(proveedores)
@@ -122,7 +125,7 @@ async def crear_datos():
             "min_stock": 20,
             "active": True,
             "expiration_date": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": "prod-002", 
@@ -136,7 +139,7 @@ async def crear_datos():
             "min_stock": 15,
             "active": True,
             "expiration_date": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": "prod-003", 
@@ -150,7 +153,7 @@ async def crear_datos():
             "min_stock": 10,
             "active": True,
             "expiration_date": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": "prod-004", 
@@ -164,7 +167,7 @@ async def crear_datos():
             "min_stock": 15,
             "active": True,
             "expiration_date": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": "prod-005", 
@@ -178,7 +181,7 @@ async def crear_datos():
             "min_stock": 25,
             "active": True,
             "expiration_date": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": "prod-006", 
@@ -192,7 +195,7 @@ async def crear_datos():
             "min_stock": 15,
             "active": True,
             "expiration_date": None,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
     ]
     await db.products.insert_many(productos)
@@ -207,7 +210,7 @@ async def crear_datos():
             "phone": "000-0000", 
             "email": "", 
             "address": "",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": "cli-002", 
@@ -215,7 +218,7 @@ async def crear_datos():
             "phone": "555-1234", 
             "email": "pedro@email.com", 
             "address": "Calle 10 #123",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": "cli-003", 
@@ -223,7 +226,7 @@ async def crear_datos():
             "phone": "555-5678", 
             "email": "maria@email.com", 
             "address": "Av. Central 456",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
     ]
     await db.customers.insert_many(clientes)
@@ -247,7 +250,7 @@ async def crear_datos():
             "discount": 0.00,
             "total": 95.00,
             "payment_method": "efectivo",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -263,12 +266,23 @@ async def crear_datos():
             "discount": 0.00,
             "total": 85.00,
             "payment_method": "tarjeta",
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
     ]
     await db.sales.insert_many(ventas)
     print("   OK - 2 ventas de ejemplo creadas")
     
+    # Nombre sin acentos que usa /api/products/search
+    await backfill_search_names(db)
+    
+    # Los catálogos cambiaron: invalida los ETags que tengan los navegadores
+    await db.collection_versions.delete_many({})
+    
+    # Resúmenes del dashboard recalculados a partir de las ventas actuales
+    await db.daily_sales.delete_many({})
+    await db.product_sales.delete_many({})
+    await rebuild_rollups(db)
+    
     client.close()
     
     print("\n" + "="*50)
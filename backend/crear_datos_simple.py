@@ -8,6 +8,9 @@ import bcrypt
 from datetime import datetime, timezone
 import uuid
 
+from rollups import rebuild_rollups
+from search_names import backfill_search_names
+
 MONGO_URL = "mongodb://localhost:27017"
 DB_NAME = "pharmacy_db"
 
@@ -47,7 +50,7 @@ async def crear_datos():
             "role": "administrador",
             "full_name": "Administrador Sistema",
             "active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -57,7 +60,7 @@ async def crear_datos():
             "role": "vendedor",
             "full_name": "Juan Perez",
             "active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         },
         {
             "id": str(uuid.uuid4()),
@@ -67,7 +70,7 @@ async def crear_datos():
             "role": "consulta",
             "full_name": "Maria Garcia",
             "active": True,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
     ]
     await db.users.insert_many(usuarios)
@@ -109,6 +112,17 @@ async def crear_datos():
     await db.customers.insert_many(clientes)
     print("  ✓ 1 cliente creado")
     
+    # Nombre sin acentos que usa /api/products/search
+    await backfill_search_names(db)
+    
+    # Los catálogos cambiaron: invalida los ETags que tengan los navegadores
+    await db.collection_versions.delete_many({})
+    
+    # Resúmenes del dashboard recalculados a partir de las ventas actuales
+    await db.daily_sales.delete_many({})
+    await db.product_sales.delete_many({})
+    await rebuild_rollups(db)
+    
     client.close()
     
     print("\n" + "="*50)
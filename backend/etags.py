@@ -0,0 +1,58 @@
+"""
+ETags de los catálogos (categorías, proveedores, productos, clientes).
+
+Cada colección tiene un contador de versión en collection_versions que suben
+todos los handlers que la modifican. El ETag se arma con ese contador, así
+responder 304 a un If-None-Match cuesta una lectura por _id y no recorre la
+colección. Los contadores se leen antes de consultar los datos y se suben
+después de escribirlos: en el peor caso una respuesta nueva sale con el ETag
+anterior y se vuelve a descargar una vez, nunca al revés.
+
+Si se modifican datos por fuera de la API (scripts, restauraciones manuales),
+basta con borrar collection_versions: cada contador se recrea con otra época y
+todos los ETags cambian.
+"""
+
+import hashlib
+import uuid
+from typing import Optional
+
+from pymongo import ReturnDocument, UpdateOne
+
+VERSIONED_COLLECTIONS = ("categories", "suppliers", "products", "customers")
+
+
+def _bump(name: str, amount: int) -> tuple:
+    return ({"_id": name}, {"$inc": {"version": amount}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}})
+
+
+async def bump_version(db, *names: str):
+    operations = [UpdateOne(*_bump(name, 1), upsert=True) for name in names]
+    if operations:
+        await db.collection_versions.bulk_write(operations, ordered=False)
+
+
+async def current_version(db, name: str) -> str:
+    document = await db.collection_versions.find_one({"_id": name})
+    if document is None:
+        document = await db.collection_versions.find_one_and_update(
+            *_bump(name, 0), upsert=True, return_document=ReturnDocument.AFTER
+        )
+    return f"{document['epoch']}.{document['version']}"
+
+
+def make_etag(name: str, version: str, variant: str = "") -> str:
+    # The variant (query string, encoding mode) gets its own tag because it
+    # changes the body
+    digest = hashlib.blake2s(variant.encode("utf-8"), digest_size=4).hexdigest()
+    return f'"{name}.{version}.{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match uses the weak comparison: W/"x" matches "x"
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
@@ -0,0 +1,112 @@
+"""
+Vista precalculada de vencimientos: cada producto activo con fecha de
+vencimiento en los próximos 180 días (o ya vencido) en la colección
+expiry_buckets, con su tramo:
+
+- expired: ya vencidos
+- 0-30, 31-90, 91-180: días hasta vencer
+
+server.py la recalcula en segundo plano cada EXPIRY_BUCKETS_REFRESH_SECONDS
+(por defecto una hora, 0 la desactiva), porque los tramos cambian solos con
+el paso de los días. Con varios workers de uvicorn solo uno la recalcula en
+cada intervalo: el que toma el lease (documento "expiry_buckets" en la
+colección leases) hasta que vence. También se puede recalcular a mano desde
+la carpeta backend:
+
+    python expiry.py
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from pymongo.errors import DuplicateKeyError
+
+EXPIRY_BUCKETS = ["expired", "0-30", "31-90", "91-180"]
+HORIZON_DAYS = 180
+DAY_MS = 24 * 3600 * 1000
+LEASE_ID = "expiry_buckets"
+
+
+def expiry_buckets_pipeline(now: datetime) -> list:
+    days = {"$floor": {"$divide": [{"$subtract": ["$expiration_date", now]}, DAY_MS]}}
+    return [
+        # Served by the active_expiration_date index
+        {"$match": {"active": True, "expiration_date": {"$type": "date", "$lte": now + timedelta(days=HORIZON_DAYS)}}},
+        {"$project": {"_id": 0, "id": 1, "name": 1, "stock": 1, "price": 1, "cost": 1, "expiration_date": 1,
+                      "days_to_expire": days}},
+        {"$set": {
+            "bucket": {"$switch": {
+                "branches": [
+                    {"case": {"$lt": ["$expiration_date", now]}, "then": "expired"},
+                    {"case": {"$lte": ["$days_to_expire", 30]}, "then": "0-30"},
+                    {"case": {"$lte": ["$days_to_expire", 90]}, "then": "31-90"},
+                ],
+                "default": "91-180",
+            }},
+            "refreshed_at": now,
+        }},
+        # $out swaps the collection in one step and keeps its indexes
+        {"$out": "expiry_buckets"},
+    ]
+
+
+async def refresh_expiry_buckets(db, now: datetime = None) -> int:
+    """Recompute expiry_buckets from the products; returns how many products it holds."""
+    now = now or datetime.now(timezone.utc)
+    await db.products.aggregate(expiry_buckets_pipeline(now)).to_list(None)
+    return await db.expiry_buckets.count_documents({})
+
+
+async def acquire_refresh_lease(db, owner: str, seconds: float, now: datetime = None) -> bool:
+    """Take (or renew) the refresh lease for `seconds`; False if another worker holds it."""
+    now = now or datetime.now(timezone.utc)
+    try:
+        # Matches only a free (expired) lease or our own; otherwise the upsert
+        # collides with the existing _id
+        await db.leases.update_one(
+            {"_id": LEASE_ID, "$or": [{"expires_at": {"$lte": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=seconds)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def expiry_summary(db) -> dict:
+    """Products, units and value at cost per bucket, from the precomputed view."""
+    summary = {bucket: {"bucket": bucket, "products": 0, "units": 0, "value": 0.0} for bucket in EXPIRY_BUCKETS}
+    pipeline = [{"$group": {
+        "_id": "$bucket",
+        "products": {"$sum": 1},
+        "units": {"$sum": "$stock"},
+        "value": {"$sum": {"$multiply": ["$stock", "$cost"]}},
+        "refreshed_at": {"$max": "$refreshed_at"},
+    }}]
+    refreshed_at = None
+    async for entry in db.expiry_buckets.aggregate(pipeline):
+        if entry["_id"] in summary:
+            summary[entry["_id"]].update(products=entry["products"], units=entry["units"],
+                                         value=round(entry["value"], 2))
+        if refreshed_at is None or entry["refreshed_at"] > refreshed_at:
+            refreshed_at = entry["refreshed_at"]
+    return {"refreshed_at": refreshed_at, "buckets": list(summary.values())}
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    try:
+        count = await refresh_expiry_buckets(client[os.environ['DB_NAME']])
+    finally:
+        client.close()
+    print(f"expiry_buckets recalculado: {count} productos")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,171 @@
+"""
+Exportación de reportes con memoria constante.
+
+Las filas llegan como un iterador asíncrono (normalmente directo del cursor de
+Motor), siempre como dicts cuyas claves son los títulos de las columnas, y se
+convierten al formato pedido:
+
+- xlsx: modo constant_memory de xlsxwriter en un archivo temporal, que después
+  se envía por partes.
+- csv y ndjson: se generan y envían fila a fila mientras se recorre el cursor.
+  El csv empieza con el BOM de UTF-8, sin el cual Excel muestra mal los
+  acentos, y siempre trae la fila de títulos, aunque el reporte esté vacío.
+- parquet: columnar, por grupos de filas en un archivo temporal, con los
+  tipos de columna que declara cada reporte. Necesita pyarrow, que es
+  opcional (pip install -r requirements-parquet.txt); sin él format=parquet
+  responde 501.
+
+La memoria usada no depende de la cantidad de filas. xlsxwriter y pyarrow se
+importan recién al exportar en esos formatos, así los workers que nunca
+exportan no los cargan; csv y ndjson solo usan la biblioteca estándar.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import tempfile
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+EXPORT_FORMATS = {
+    "xlsx": XLSX_MEDIA_TYPE,
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+# Query pattern for the format= parameter, "json" is the regular API response
+FORMAT_PATTERN = "^(json|xlsx|csv|ndjson|parquet)$"
+
+# Small workbooks stay in memory, bigger ones go to disk
+SPOOL_MAX_SIZE = 4 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+PARQUET_ROW_GROUP_SIZE = 50_000
+
+
+async def write_xlsx(rows, sheet_name: str):
+    """Write the rows (dicts, keys are the column titles) to a temporary file and return it rewound."""
+    import xlsxwriter
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    try:
+        worksheet = workbook.add_worksheet(sheet_name[:31])
+        header_format = workbook.add_format({"bold": True, "border": 1})
+        columns = None
+        row_number = 1
+        async for row in rows:
+            if columns is None:
+                columns = list(row)
+                worksheet.write_row(0, 0, columns, header_format)
+            worksheet.write_row(row_number, 0, [row[column] for column in columns])
+            row_number += 1
+    finally:
+        # Zipping the workbook is CPU bound, keep it off the event loop
+        await asyncio.to_thread(workbook.close)
+    output.seek(0)
+    return output
+
+
+async def write_parquet(rows, columns: dict):
+    """Write the rows to a temporary Parquet file, one row group per PARQUET_ROW_GROUP_SIZE rows.
+
+    columns maps each column title to "string", "int" or "float". The schema is
+    fixed up front: a row group where a column is all null (or holds ints
+    where others hold floats) still matches the rest of the file.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Parquet export requires pyarrow")
+
+    types = {"string": pa.string(), "int": pa.int64(), "float": pa.float64()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns.items()])
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    writer = pq.ParquetWriter(output, schema, compression="snappy")
+    batch = []
+
+    async def flush():
+        table = pa.Table.from_pylist(batch, schema=schema)
+        await asyncio.to_thread(writer.write_table, table)
+        batch.clear()
+
+    try:
+        async for row in rows:
+            batch.append(row)
+            if len(batch) >= PARQUET_ROW_GROUP_SIZE:
+                await flush()
+        if batch:
+            await flush()
+    finally:
+        writer.close()
+    output.seek(0)
+    return output
+
+
+async def iter_csv(rows, columns):
+    buffer = io.StringIO()
+    buffer.write("\ufeff")
+    writer = csv.DictWriter(buffer, fieldnames=list(columns))
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+async def iter_ndjson(rows):
+    lines = []
+    size = 0
+    async for row in rows:
+        line = json.dumps(row, ensure_ascii=False, default=str)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines, size = [], 0
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def iter_file(file, chunk_size: int = CHUNK_SIZE):
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+
+async def export_response(rows, output_format: str, sheet_name: str, filename: str, columns: dict) -> StreamingResponse:
+    """Return the report rows as a download in the given format; filename has no extension.
+
+    columns maps the column titles to their types, see write_parquet; csv
+    also takes its header row from it.
+    """
+    if output_format == "xlsx":
+        body = iter_file(await write_xlsx(rows, sheet_name))
+    elif output_format == "parquet":
+        body = iter_file(await write_parquet(rows, columns))
+    elif output_format == "csv":
+        body = iter_csv(rows, columns)
+    elif output_format == "ndjson":
+        body = iter_ndjson(rows)
+    else:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {output_format}")
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[output_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}.{output_format}'}
+    )
+
@@ -0,0 +1,184 @@
+"""
+Índices de MongoDB del sistema de farmacia.
+
+server.py llama a ensure_indexes() al iniciar, así que normalmente no hace
+falta hacer nada. En una base de datos grande conviene construirlos antes de
+levantar la API, desde la carpeta backend:
+
+    python indexes.py           # crea los índices que falten
+    python indexes.py --check   # solo reporta diferencias (no modifica nada)
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from pathlib import Path
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import PyMongoError
+
+# Incremental backups need a base newer than this
+DELETIONS_TTL_SECONDS = 90 * 24 * 3600
+
+# Declared indexes per collection. Names are explicit so drift is detected by
+# name: an index whose key or options differ from the declaration is reported
+# as "mismatched" and never dropped automatically.
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "categories": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "suppliers": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "products": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+        # Not unique: the product form sends "" when no barcode is entered
+        IndexModel([("barcode", ASCENDING)], name="barcode"),
+        # Normalized name used by the POS prefix search
+        IndexModel([("search_name", ASCENDING)], name="search_name"),
+        # Expiring products report and expiry buckets
+        IndexModel([("active", ASCENDING), ("expiration_date", ASCENDING)], name="active_expiration_date"),
+    ],
+    "customers": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at"),
+    ],
+    "sales": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("customer_id", ASCENDING)], name="customer_id"),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "inventory_movements": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("product_id", ASCENDING), ("created_at", DESCENDING)], name="product_id_created_at"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+    ],
+    # Tombstones of hard deletes, read by incremental backups
+    "deletions": [
+        IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl", expireAfterSeconds=DELETIONS_TTL_SECONDS),
+    ],
+    "expiry_buckets": [
+        IndexModel([("bucket", ASCENDING), ("expiration_date", ASCENDING)], name="bucket_expiration_date"),
+    ],
+    "daily_sales": [
+        IndexModel([("date", ASCENDING)], name="date_unique", unique=True),
+    ],
+    "product_sales": [
+        IndexModel([("period", ASCENDING), ("product_id", ASCENDING)], name="period_product_id_unique", unique=True),
+        IndexModel([("period", ASCENDING), ("quantity", DESCENDING)], name="period_quantity"),
+    ],
+}
+
+# Options compared when checking an existing index against its declaration
+_COMPARED_OPTIONS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+
+def _spec(document: dict) -> dict:
+    spec = {"key": list(document["key"].items())}
+    for option in _COMPARED_OPTIONS:
+        if document.get(option):
+            spec[option] = document[option]
+    return spec
+
+
+async def index_drift(db, collection_name: str) -> dict:
+    declared = {model.document["name"]: model.document for model in INDEXES[collection_name]}
+    existing = {}
+    async for index in db[collection_name].list_indexes():
+        if index["name"] != "_id_":
+            existing[index["name"]] = index
+
+    missing = [name for name in declared if name not in existing]
+    mismatched = [
+        name for name in declared
+        if name in existing and _spec(declared[name]) != _spec(existing[name])
+    ]
+    extra = [name for name in existing if name not in declared]
+    return {"missing": missing, "mismatched": mismatched, "extra": extra}
+
+
+async def ensure_indexes(db, collections=None, log=None) -> dict:
+    """Create every declared index that is missing; returns the drift per collection."""
+    report = {}
+    for collection_name in collections or INDEXES:
+        drift = await index_drift(db, collection_name)
+        created, failed = [], {}
+        models = {model.document["name"]: model for model in INDEXES[collection_name]}
+        # One index at a time so a single failure (e.g. duplicated usernames
+        # blocking a unique index) does not prevent building the others
+        for name in drift["missing"]:
+            started = time.perf_counter()
+            try:
+                await db[collection_name].create_indexes([models[name]])
+                created.append(name)
+                if log:
+                    log(f"{collection_name}.{name} created in {time.perf_counter() - started:.2f}s")
+            except PyMongoError as e:
+                failed[name] = str(e)
+                if log:
+                    log(f"{collection_name}.{name} FAILED: {e}")
+        report[collection_name] = {
+            "created": created,
+            "failed": failed,
+            "mismatched": drift["mismatched"],
+            "extra": drift["extra"],
+        }
+    return report
+
+
+async def build_indexes(collection, collection_name: str):
+    """Create all declared indexes of collection_name on another (e.g. staging) collection."""
+    await collection.create_indexes(INDEXES[collection_name])
+
+
+async def check_indexes(db, collections=None) -> dict:
+    return {name: await index_drift(db, name) for name in collections or INDEXES}
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Crea o verifica los índices de MongoDB")
+    parser.add_argument("--check", action="store_true", help="solo reporta diferencias, no crea índices")
+    parser.add_argument("--collection", action="append", choices=sorted(INDEXES),
+                        help="limita la operación a una colección (se puede repetir)")
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if args.check:
+            report = await check_indexes(db, args.collection)
+        else:
+            report = await ensure_indexes(db, args.collection, log=print)
+    finally:
+        client.close()
+
+    drift_found = False
+    for collection_name, entry in report.items():
+        problems = {key: value for key, value in entry.items() if value and key != "created"}
+        drift_found = drift_found or bool(problems)
+        print(f"{collection_name}: {problems or 'OK'}")
+    return 1 if drift_found else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(asyncio.run(main()))
@@ -0,0 +1,289 @@
+"""
+Métricas de la API en formato de texto de Prometheus, servidas en /metrics.
+
+- Peticiones HTTP por ruta (la plantilla, /api/products/{product_id}, no la
+  URL): total por código de estado, histograma de latencia y peticiones en
+  curso.
+- Comandos de MongoDB por colección y operación: histograma de latencia y
+  errores, a partir de un CommandListener de pymongo registrado en el
+  cliente de Motor.
+- Pool de conexiones por servidor: conexiones abiertas, en uso y fallos al
+  obtener una.
+- Valores calculados al leer /metrics, como los aciertos de las cachés.
+
+Se mantiene todo en memoria por proceso (con varios workers de uvicorn cada
+uno expone lo suyo). Registrar una muestra es una búsqueda en un dict y una
+suma bajo un lock, así que puede quedar activo en producción; para
+desactivarlo, METRICS_ENABLED=false. El endpoint no pide autenticación, como
+espera Prometheus: conviene no exponerlo fuera de la red interna.
+"""
+
+import time
+from bisect import bisect_left
+from threading import Lock
+
+from pymongo import monitoring
+
+TEXT_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; the API answers in milliseconds, exports and backups take seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values = {}
+        self._lock = Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{format_labels(self.labels, label_values)} {format_value(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, *label_values, value):
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [count per bucket (last one is +Inf), sum]
+        self._values = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(label_values, list(counts), total) for label_values, (counts, total) in self._values.items()]
+        for label_values, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{format_value(bound)}"'
+                yield f"{self.name}_bucket{format_labels(self.labels, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.labels, label_values)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(self.labels, label_values)} {cumulative}"
+
+
+class Callback:
+    """Value read when /metrics is scraped; `read` returns {label values: value}."""
+
+    def __init__(self, name: str, help: str, kind: str, labels: tuple, read):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = labels
+        self.read = read
+
+    def samples(self):
+        for label_values, value in self.read().items():
+            yield f"{self.name}{format_labels(self.labels, label_values)} {format_value(value)}"
+
+
+class Metrics:
+    def __init__(self):
+        self._metrics = []
+        self.http_requests = self.add(Counter(
+            "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")))
+        self.http_duration = self.add(Histogram(
+            "http_request_duration_seconds", "HTTP request latency, including streamed bodies", ("method", "route")))
+        self.http_in_flight = self.add(Gauge(
+            "http_requests_in_flight", "HTTP requests being served", ("method", "route")))
+        self.mongo_duration = self.add(Histogram(
+            "mongodb_command_duration_seconds", "MongoDB command latency", ("collection", "command")))
+        self.mongo_failures = self.add(Counter(
+            "mongodb_command_failures_total", "MongoDB commands that failed", ("collection", "command")))
+        self.pool_connections = self.add(Gauge(
+            "mongodb_pool_connections", "Open connections in the pool", ("address",)))
+        self.pool_checked_out = self.add(Gauge(
+            "mongodb_pool_checked_out_connections", "Pool connections in use", ("address",)))
+        self.pool_checkout_failures = self.add(Counter(
+            "mongodb_pool_checkout_failures_total", "Failed pool checkouts", ("address", "reason")))
+        self.pool_cleared = self.add(Counter(
+            "mongodb_pool_cleared_total", "Times the pool was cleared after an error", ("address",)))
+
+    def add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def callback(self, name: str, help: str, kind: str, labels: tuple, read):
+        return self.add(Callback(name, help, kind, labels, read))
+
+    def listeners(self) -> list:
+        """pymongo event listeners to pass to the client as event_listeners."""
+        return [MongoCommandMetrics(self), MongoPoolMetrics(self)]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def command_collection(command_name: str, command: dict) -> str:
+    # find/insert/update/aggregate... name the collection in the command
+    # itself; getMore names it in "collection"
+    value = command.get(command_name)
+    if isinstance(value, str):
+        return value
+    return command.get("collection") or "-"
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    # Called from the driver threads Motor runs pymongo on
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[(event.connection_id, event.request_id)] = command_collection(event.command_name, event.command)
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        self.metrics.mongo_duration.observe(event.duration_micros / 1_000_000, collection, event.command_name)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.connection_id, event.request_id), "-")
+        self.metrics.mongo_duration.observe(event.duration_micros / 1_000_000, collection, event.command_name)
+        self.metrics.mongo_failures.inc(collection, event.command_name)
+
+
+def pool_address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self.metrics.pool_cleared.inc(pool_address(event))
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self.metrics.pool_connections.inc(pool_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self.metrics.pool_connections.dec(pool_address(event))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self.metrics.pool_checkout_failures.inc(pool_address(event), event.reason)
+
+    def connection_checked_out(self, event):
+        self.metrics.pool_checked_out.inc(pool_address(event))
+
+    def connection_checked_in(self, event):
+        self.metrics.pool_checked_out.dec(pool_address(event))
+
+
+def count_in_flight(metrics: Metrics, path: str, app):
+    # Wraps the ASGI app of one route, so the route is known without matching
+    async def instrumented(scope, receive, send):
+        method = scope["method"]
+        metrics.http_in_flight.inc(method, path)
+        try:
+            await app(scope, receive, send)
+        finally:
+            metrics.http_in_flight.dec(method, path)
+    return instrumented
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing every HTTP request under its route template."""
+
+    def __init__(self, app, metrics: Metrics, router):
+        self.app = app
+        self.metrics = metrics
+        # The middleware stack is built on the first request, once every
+        # route is registered; in-flight requests are counted inside each route
+        for route in router.routes:
+            if isinstance(getattr(route, "path", None), str) and hasattr(route, "app"):
+                route.app = count_in_flight(metrics, route.path, route.app)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router leaves the matched route in the scope; raw URLs carry
+            # ids, labels use the template so they stay bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.metrics.http_requests.inc(scope["method"], route, str(status))
+            self.metrics.http_duration.observe(time.perf_counter() - started, scope["method"], route)
@@ -0,0 +1,120 @@
+"""
+Migración de fechas guardadas como texto ISO a fechas nativas de MongoDB.
+
+Las versiones anteriores guardaban created_at y expiration_date con
+.isoformat(). server.py ya guarda fechas nativas y lanza esta migración en
+segundo plano al iniciar; también se puede ejecutar a mano desde la carpeta
+backend, con la API funcionando:
+
+    python migrate_dates.py             # convierte todas las colecciones
+    python migrate_dates.py --dry-run   # solo cuenta los documentos pendientes
+
+Recorre cada colección por _id en lotes y solo actualiza un documento si el
+valor sigue siendo el mismo texto, así no pisa escrituras concurrentes.
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+DATE_FIELDS = {
+    "users": ["created_at"],
+    "categories": ["created_at"],
+    "suppliers": ["created_at"],
+    "products": ["created_at", "expiration_date"],
+    "customers": ["created_at"],
+    "sales": ["created_at"],
+    "inventory_movements": ["created_at"],
+}
+
+BATCH_SIZE = 1000
+
+
+def parse_stored_date(value):
+    """ISO text as written by older versions -> aware UTC datetime (naive text is taken as UTC)."""
+    if not isinstance(value, str):
+        return value
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        return parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def convert_document_dates(collection_name: str, document: dict) -> dict:
+    for field in DATE_FIELDS.get(collection_name, []):
+        if isinstance(document.get(field), str):
+            document[field] = parse_stored_date(document[field])
+    return document
+
+
+async def migrate_collection(db, collection_name: str, batch_size: int = BATCH_SIZE, dry_run: bool = False, log=None) -> dict:
+    fields = DATE_FIELDS[collection_name]
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    converted, invalid, last_id = 0, 0, None
+
+    if dry_run:
+        return {"pending": await db[collection_name].count_documents(query)}
+
+    while True:
+        batch_query = {"$and": [query, {"_id": {"$gt": last_id}}]} if last_id is not None else query
+        batch = await db[collection_name].find(batch_query, projection).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+
+        operations = []
+        for document in batch:
+            for field in fields:
+                value = document.get(field)
+                if not isinstance(value, str):
+                    continue
+                try:
+                    parsed = parse_stored_date(value)
+                except ValueError:
+                    invalid += 1
+                    continue
+                operations.append(UpdateOne({"_id": document["_id"], field: value}, {"$set": {field: parsed}}))
+        if operations:
+            result = await db[collection_name].bulk_write(operations, ordered=False)
+            converted += result.modified_count
+        if log:
+            log(f"{collection_name}: {converted} fechas convertidas")
+        # Give the API room between batches when running online
+        await asyncio.sleep(0)
+
+    return {"converted": converted, "invalid": invalid}
+
+
+async def migrate_dates(db, batch_size: int = BATCH_SIZE, dry_run: bool = False, log=None) -> dict:
+    return {
+        name: await migrate_collection(db, name, batch_size, dry_run, log)
+        for name in DATE_FIELDS
+    }
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Convierte fechas ISO en texto a fechas nativas")
+    parser.add_argument("--dry-run", action="store_true", help="solo cuenta los documentos pendientes")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], tz_aware=True)
+    try:
+        report = await migrate_dates(client[os.environ['DB_NAME']], args.batch_size, args.dry_run, log=print)
+    finally:
+        client.close()
+    for collection_name, entry in report.items():
+        print(f"{collection_name}: {entry}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Paginación por cursor (keyset) sobre (created_at, id).
+
+Cada página se resuelve con un seek sobre el índice compuesto
+(created_at, id) declarado en indexes.py, sin importar qué tan profunda sea
+la página, y nunca se cargan más de `limit + 1` documentos en memoria.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel
+from pymongo import DESCENDING
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+SORT = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(document: dict) -> str:
+    created_at = document.get("created_at")
+    if isinstance(created_at, datetime):
+        created_at = {"$date": created_at.isoformat()}
+    raw = json.dumps([created_at, document["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, last_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if isinstance(created_at, dict):
+            created_at = datetime.fromisoformat(created_at["$date"])
+        if not isinstance(last_id, str):
+            raise ValueError("cursor id must be a string")
+        return created_at, last_id
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _after_filter(created_at, last_id: str) -> dict:
+    # Documents without created_at sort last in descending order, so once the
+    # cursor reaches them only the id tie-breaker is left
+    if created_at is None:
+        return {"created_at": None, "id": {"$lt": last_id}}
+    return {"$or": [
+        {"created_at": {"$lt": created_at}},
+        {"created_at": created_at, "id": {"$lt": last_id}},
+        {"created_at": None},
+    ]}
+
+
+async def paginate(collection, query: dict, limit: int, after: Optional[str] = None,
+                   projection: Optional[dict] = None):
+    """Return (documents, next_cursor) for one page ordered by created_at, id descending."""
+    if after:
+        seek = _after_filter(*decode_cursor(after))
+        query = {"$and": [query, seek]} if query else seek
+    cursor = collection.find(query, projection or {"_id": 0}).sort(SORT).limit(limit + 1)
+    documents = await cursor.to_list(limit + 1)
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1])
+    return documents, next_cursor
@@ -0,0 +1,182 @@
+"""
+Resúmenes de ventas mantenidos incrementalmente:
+
+- daily_sales: totales por día (gráfico del dashboard y totales del mes).
+- product_sales: cantidad vendida e ingresos por producto, para todo el
+  historial (period "all") y por mes (period "YYYY-MM").
+
+create_sale los actualiza con $inc al registrar cada venta, así el dashboard
+y los productos más vendidos leen unos pocos documentos pequeños en lugar de
+recorrer las ventas. Para reconstruirlos a partir de las ventas (por ejemplo
+después de importar datos), desde la carpeta backend:
+
+    python rollups.py
+"""
+
+import asyncio
+import os
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+ALL_TIME = "all"
+
+
+def day_key(created_at) -> str:
+    # Days are UTC, like the created_at values themselves
+    return created_at[:10] if isinstance(created_at, str) else created_at.strftime("%Y-%m-%d")
+
+
+def month_key(created_at) -> str:
+    return day_key(created_at)[:7]
+
+
+def payment_key(method: str) -> str:
+    # Payment methods become field names inside payment_methods
+    return (method or "otro").replace(".", "_").replace("$", "_")
+
+
+def daily_sales_update(sale_doc: dict):
+    """Filter and $inc update that add one sale to its day."""
+    method = payment_key(sale_doc["payment_method"])
+    update = {"$inc": {
+        "count": 1,
+        "subtotal": sale_doc["subtotal"],
+        "tax": sale_doc["tax"],
+        "discount": sale_doc["discount"],
+        "total": sale_doc["total"],
+        f"payment_methods.{method}.count": 1,
+        f"payment_methods.{method}.total": sale_doc["total"],
+    }}
+    return {"date": day_key(sale_doc["created_at"])}, update
+
+
+def product_sales_updates(sale_doc: dict) -> list:
+    """Upserts adding the sale lines to the all-time and monthly product counters."""
+    totals = {}
+    for detail in sale_doc["details"]:
+        entry = totals.setdefault(detail["product_id"], {"name": detail["product_name"], "quantity": 0, "revenue": 0.0})
+        entry["quantity"] += detail["quantity"]
+        entry["revenue"] += detail["subtotal"]
+    return [
+        UpdateOne(
+            {"period": period, "product_id": product_id},
+            {"$inc": {"quantity": entry["quantity"], "revenue": entry["revenue"]}, "$set": {"name": entry["name"]}},
+            upsert=True,
+        )
+        for product_id, entry in totals.items()
+        for period in (ALL_TIME, month_key(sale_doc["created_at"]))
+    ]
+
+
+# created_at may be an ISO string or a BSON date
+_DAY_EXPRESSION = {"$cond": [
+    {"$eq": [{"$type": "$created_at"}, "date"]},
+    {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+    {"$substrCP": ["$created_at", 0, 10]},
+]}
+
+_PAYMENT_EXPRESSION = {"$replaceAll": {
+    "input": {"$replaceAll": {"input": {"$ifNull": ["$payment_method", "otro"]}, "find": ".", "replacement": "_"}},
+    "find": "$", "replacement": "_",
+}}
+
+
+async def rebuild_daily_sales(db):
+    """Recompute daily_sales from the raw sales, replacing the collection."""
+    pipeline = [
+        {"$group": {
+            "_id": {"date": _DAY_EXPRESSION, "method": _PAYMENT_EXPRESSION},
+            "count": {"$sum": 1},
+            "subtotal": {"$sum": "$subtotal"},
+            "tax": {"$sum": "$tax"},
+            "discount": {"$sum": "$discount"},
+            "total": {"$sum": "$total"},
+        }},
+        {"$group": {
+            "_id": "$_id.date",
+            "count": {"$sum": "$count"},
+            "subtotal": {"$sum": "$subtotal"},
+            "tax": {"$sum": "$tax"},
+            "discount": {"$sum": "$discount"},
+            "total": {"$sum": "$total"},
+            "payment_methods": {"$push": {"k": "$_id.method", "v": {"count": "$count", "total": "$total"}}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "date": "$_id",
+            "count": 1,
+            "subtotal": 1,
+            "tax": 1,
+            "discount": 1,
+            "total": 1,
+            "payment_methods": {"$arrayToObject": "$payment_methods"},
+        }},
+        # $out swaps the collection in one step and keeps its indexes
+        {"$out": "daily_sales"},
+    ]
+    await db.sales.aggregate(pipeline).to_list(None)
+    return await db.daily_sales.count_documents({})
+
+
+async def rebuild_product_sales(db):
+    """Recompute product_sales (all-time and monthly) from the raw sales."""
+    pipeline = [
+        {"$unwind": "$details"},
+        {"$group": {
+            "_id": {"product_id": "$details.product_id", "month": {"$substrCP": [_DAY_EXPRESSION, 0, 7]}},
+            "name": {"$last": "$details.product_name"},
+            "quantity": {"$sum": "$details.quantity"},
+            "revenue": {"$sum": "$details.subtotal"},
+        }},
+        # Each monthly row also counts towards the all-time row
+        {"$project": {"rows": [
+            {"period": "$_id.month", "product_id": "$_id.product_id", "name": "$name",
+             "quantity": "$quantity", "revenue": "$revenue"},
+            {"period": ALL_TIME, "product_id": "$_id.product_id", "name": "$name",
+             "quantity": "$quantity", "revenue": "$revenue"},
+        ]}},
+        {"$unwind": "$rows"},
+        {"$group": {
+            "_id": {"period": "$rows.period", "product_id": "$rows.product_id"},
+            "name": {"$last": "$rows.name"},
+            "quantity": {"$sum": "$rows.quantity"},
+            "revenue": {"$sum": "$rows.revenue"},
+        }},
+        {"$project": {
+            "_id": 0,
+            "period": "$_id.period",
+            "product_id": "$_id.product_id",
+            "name": 1,
+            "quantity": 1,
+            "revenue": 1,
+        }},
+        {"$out": "product_sales"},
+    ]
+    await db.sales.aggregate(pipeline, allowDiskUse=True).to_list(None)
+    return await db.product_sales.count_documents({"period": ALL_TIME})
+
+
+async def rebuild_rollups(db) -> dict:
+    return {
+        "days": await rebuild_daily_sales(db),
+        "products": await rebuild_product_sales(db),
+    }
+
+
+async def main():
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    try:
+        result = await rebuild_rollups(client[os.environ['DB_NAME']])
+    finally:
+        client.close()
+    print(f"daily_sales reconstruido: {result['days']} días")
+    print(f"product_sales reconstruido: {result['products']} productos")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
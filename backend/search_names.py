@@ -0,0 +1,21 @@
+"""
+Nombre de búsqueda de los productos (campo search_name): el nombre en
+minúsculas y sin acentos, para que /api/products/search encuentre "Ácido"
+buscando "acido" con una expresión regular de prefijo que usa el índice.
+
+La API lo guarda al crear o renombrar un producto. Los productos cargados por
+fuera de la API (scripts crear_datos*, restauraciones) se completan con
+backfill_search_names.
+"""
+
+import unicodedata
+
+
+def search_key(text: str) -> str:
+    normalized = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(c for c in normalized if not unicodedata.combining(c)).strip()
+
+
+async def backfill_search_names(db):
+    async for product in db.products.find({"search_name": {"$exists": False}}, {"_id": 0, "id": 1, "name": 1}):
+        await db.products.update_one({"id": product["id"]}, {"$set": {"search_name": search_key(product["name"])}})
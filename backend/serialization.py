@@ -0,0 +1,78 @@
+"""
+Serialización rápida de los listados.
+
+Por defecto FastAPI valida cada documento contra el response_model, lo
+convierte a tipos JSON en Python y recién entonces lo codifica con el módulo
+json. Con FAST_JSON (desactivado por defecto) los listados arman la respuesta
+directamente:
+
+- FAST_JSON=validate: valida la lista de una vez con un TypeAdapter en caché y
+  la codifica con el serializador de pydantic-core.
+- FAST_JSON=trusted: confía en los documentos (los escribe esta misma API),
+  pide a MongoDB solo los campos del modelo y los codifica con orjson. Los
+  campos que falten en documentos antiguos no se completan con sus valores
+  por defecto.
+
+En ambos casos las fechas se codifican de forma nativa (ISO 8601, UTC con Z).
+"""
+
+import logging
+from functools import lru_cache
+from typing import List, Optional
+
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # optional, only needed for FAST_JSON=trusted
+    orjson = None
+
+FAST_JSON_MODES = ("off", "validate", "trusted")
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def list_adapter(model) -> TypeAdapter:
+    return TypeAdapter(List[model])
+
+
+@lru_cache(maxsize=None)
+def model_projection(model) -> dict:
+    return {"_id": 0, **{name: 1 for name in model.model_fields}}
+
+
+def dumps(value) -> bytes:
+    return orjson.dumps(value, option=orjson.OPT_UTC_Z | orjson.OPT_NAIVE_UTC)
+
+
+class FastJSON:
+    def __init__(self, mode: str = "off"):
+        if mode not in FAST_JSON_MODES:
+            raise ValueError(f"FAST_JSON must be one of {', '.join(FAST_JSON_MODES)}, not {mode!r}")
+        if mode == "trusted" and orjson is None:
+            logger.warning("FAST_JSON=trusted needs orjson, falling back to validate")
+            mode = "validate"
+        self.mode = mode
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def projection(self, model) -> Optional[dict]:
+        """Fields to read from Mongo for a list of model, None for whole documents."""
+        return model_projection(model) if self.mode == "trusted" else None
+
+    def encode_items(self, items: list, model) -> bytes:
+        if self.mode == "trusted":
+            return dumps(items)
+        adapter = list_adapter(model)
+        return adapter.dump_json(adapter.validate_python(items))
+
+    def response(self, items: list, model, next_cursor: Optional[str] = None, paged: bool = False) -> Response:
+        body = self.encode_items(items, model)
+        if paged:
+            cursor = b"null" if next_cursor is None else b'"' + next_cursor.encode("ascii") + b'"'
+            body = b'{"items":' + body + b',"next_cursor":' + cursor + b"}"
+        return Response(content=body, media_type="application/json")
@@ -1,36 +1,92 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Response
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, Request, Response, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
 from typing import List, Optional
 import uuid
+import re
 from datetime import datetime, timezone, timedelta
 import jwt
 from passlib.context import CryptContext
-import io
 from fastapi.responses import StreamingResponse
-import pandas as pd
+from indexes import ensure_indexes, check_indexes
+from pagination import Page, paginate, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from backup import BACKUP_MEDIA_TYPE, BackupError, backup_filename, find_backup_base, iter_backup, iter_upload, restore_backup
+from cache import TTLCache
+from passwords import PasswordHasher, PasswordHasherBusy
+from migrate_dates import migrate_dates
+from exports import FORMAT_PATTERN, export_response
+from serialization import FastJSON
+from etags import VERSIONED_COLLECTIONS, bump_version, current_version, etag_matches, make_etag
+from expiry import acquire_refresh_lease, expiry_summary, refresh_expiry_buckets
+from metrics import TEXT_CONTENT_TYPE, Counter, Metrics, RequestMetricsMiddleware
+from slowlog import RequestContextMiddleware, SlowQueryLog
+from search_names import backfill_search_names, search_key
+from rollups import ALL_TIME, daily_sales_update, month_key, product_sales_updates, rebuild_rollups
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Prometheus-style metrics served on /metrics, see metrics.py
+metrics_enabled = os.environ.get('METRICS_ENABLED', 'true').lower() not in ('false', '0', 'no')
+metrics = Metrics()
+
+# Mongo commands slower than SLOW_QUERY_MS, see slowlog.py
+slow_queries = SlowQueryLog(
+    threshold_ms=float(os.environ.get('SLOW_QUERY_MS', 100)),
+    maxsize=int(os.environ.get('SLOW_QUERY_LOG_SIZE', 500)),
+    explain=os.environ.get('SLOW_QUERY_EXPLAIN', 'true').lower() not in ('false', '0', 'no')
+)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    tz_aware=True,
+    event_listeners=(metrics.listeners() if metrics_enabled else []) + [slow_queries]
+)
 db = client[os.environ['DB_NAME']]
 
+# Multi-document transactions need a replica set or mongos; detected at
+# startup unless MONGO_TRANSACTIONS=false
+use_transactions = False
+
+# Opt-in fast encoding of the list endpoints: off, validate or trusted
+fast_json = FastJSON(os.environ.get('FAST_JSON', 'off'))
+
+# Background task refreshing the expiry buckets, see start_expiry_refresh
+expiry_refresh_task = None
+
+# Only one restore at a time, they share the staging collections
+restore_lock = asyncio.Lock()
+
 # Security
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher(
+    pwd_context,
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', 2)),
+    max_pending=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 32))
+)
 security = HTTPBearer()
 
+# Authenticated users by id. Changes made through the API invalidate the entry
+# right away; anything else (scripts, restores) is picked up after the TTL
+user_cache = TTLCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('USER_CACHE_TTL', 30))
+)
+
 # Create the main app
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -48,6 +104,7 @@ class User(BaseModel):
     full_name: str
     active: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
 
 class UserCreate(BaseModel):
     username: str
@@ -74,7 +131,7 @@ class UserResponse(BaseModel):
     role: str
     full_name: str
     active: bool
-    created_at: datetime
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 # Category Models
 class Category(BaseModel):
@@ -83,6 +140,7 @@ class Category(BaseModel):
     name: str
     description: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
 
 class CategoryCreate(BaseModel):
     name: str
@@ -98,6 +156,7 @@ class Supplier(BaseModel):
     email: EmailStr
     address: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
 
 class SupplierCreate(BaseModel):
     name: str
@@ -122,6 +181,7 @@ class Product(BaseModel):
     barcode: Optional[str] = None
     active: bool = True
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
 
 class ProductCreate(BaseModel):
     name: str
@@ -157,6 +217,7 @@ class Customer(BaseModel):
     email: Optional[str] = None
     address: Optional[str] = None
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: Optional[datetime] = None
 
 class CustomerCreate(BaseModel):
     name: str
@@ -216,11 +277,17 @@ class InventoryMovementCreate(BaseModel):
 
 # ==================== AUTHENTICATION ====================
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, try again")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    try:
+        return await password_hasher.verify(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, try again")
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
@@ -236,10 +303,16 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-        user = await db.users.find_one({"id": user_id}, {"_id": 0})
+        user = user_cache.get(user_id)
         if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        return User(**user)
+            user = await db.users.find_one({"id": user_id}, {"_id": 0})
+            if user is None:
+                raise HTTPException(status_code=401, detail="User not found")
+            user = User(**user)
+            user_cache.set(user_id, user)
+        if not user.active:
+            raise HTTPException(status_code=401, detail="User is inactive")
+        return user
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
@@ -252,12 +325,61 @@ def require_role(required_roles: List[str]):
         return current_user
     return role_checker
 
+# ==================== PAGINATION ====================
+
+async def find_page(collection, query: dict, limit: int, after: Optional[str], projection=None):
+    # Every list is paged, DEFAULT_PAGE_SIZE documents unless limit says
+    # otherwise; callers that need everything follow next_cursor
+    try:
+        return await paginate(collection, query, limit, after, projection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def page_response(items: list, next_cursor: Optional[str], model=None):
+    # With FAST_JSON the page is encoded here and FastAPI's per-row
+    # response_model validation is skipped, see serialization.py
+    if model is not None and fast_json.enabled:
+        return fast_json.response(items, model, next_cursor, paged=True)
+    return {"items": items, "next_cursor": next_cursor}
+
+# ==================== CHANGE TRACKING ====================
+
+async def record_deletion(collection_name: str, document_id: str):
+    # Hard deletes leave no document behind, incremental backups read these
+    await db.deletions.insert_one({
+        "collection": collection_name,
+        "id": document_id,
+        "deleted_at": datetime.now(timezone.utc)
+    })
+
+# Catalog lists are revalidated on every use: the browser keeps the body and
+# sends If-None-Match, unchanged catalogs answer 304 (see etags.py)
+CATALOG_CACHE_CONTROL = "private, no-cache"
+etag_revalidations = metrics.add(Counter(
+    "catalog_etag_responses_total", "Catalog list responses, 304 (not_modified) or full body", ("result",)))
+
+async def catalog_etag(collection_name: str, request: Request) -> str:
+    version = await current_version(db, collection_name)
+    return make_etag(collection_name, version, f"{request.url.query}|{fast_json.mode}")
+
+def not_modified(etag: str) -> Response:
+    etag_revalidations.inc("not_modified")
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL})
+
+def with_etag(result, response: Response, etag: str):
+    # FastAPI ignores the injected response when the handler returns its own
+    etag_revalidations.inc("modified")
+    target = result if isinstance(result, Response) else response
+    target.headers["ETag"] = etag
+    target.headers["Cache-Control"] = CATALOG_CACHE_CONTROL
+    return result
+
 # ==================== AUTHENTICATION ENDPOINTS ====================
 
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"username": credentials.username}, {"_id": 0})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    if not user or not await verify_password(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     if not user.get("active", True):
@@ -293,25 +415,29 @@ async def create_user(
     user = User(
         username=user_data.username,
         email=user_data.email,
-        password_hash=hash_password(user_data.password),
+        password_hash=await hash_password(user_data.password),
         role=user_data.role,
         full_name=user_data.full_name
     )
     
     doc = user.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.users.insert_one(doc)
+    try:
+        await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        # Created concurrently between the checks and the insert
+        raise HTTPException(status_code=400, detail="Username or email already exists")
     return UserResponse(**user.model_dump())
 
-@api_router.get("/users", response_model=List[UserResponse])
-async def get_users(current_user: User = Depends(require_role(["administrador"]))):
-    users = await db.users.find({}, {"_id": 0}).to_list(1000)
-    for user in users:
-        if 'created_at' in user and isinstance(user['created_at'], str):
-            user['created_at'] = datetime.fromisoformat(user['created_at'])
-        elif 'created_at' not in user:
-            user['created_at'] = datetime.now(timezone.utc)
-    return [UserResponse(**u) for u in users]
+@api_router.get("/users", response_model=Page[UserResponse])
+async def get_users(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: User = Depends(require_role(["administrador"]))
+):
+    users, next_cursor = await find_page(db.users, {}, limit, after, projection=fast_json.projection(UserResponse))
+    if fast_json.enabled:
+        return page_response(users, next_cursor, model=UserResponse)
+    return page_response([UserResponse(**u) for u in users], next_cursor)
 
 @api_router.get("/users/{user_id}", response_model=UserResponse)
 async def get_user(
@@ -321,10 +447,6 @@ async def get_user(
     user = await db.users.find_one({"id": user_id}, {"_id": 0})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if 'created_at' in user and isinstance(user['created_at'], str):
-        user['created_at'] = datetime.fromisoformat(user['created_at'])
-    elif 'created_at' not in user:
-        user['created_at'] = datetime.now(timezone.utc)
     return UserResponse(**user)
 
 @api_router.put("/users/{user_id}", response_model=UserResponse)
@@ -338,17 +460,21 @@ async def update_user(
         raise HTTPException(status_code=404, detail="User not found")
     
     update_data = user_data.model_dump(exclude_unset=True)
+    if update_data.get("email") and update_data["email"] != user.get("email"):
+        if await db.users.find_one({"email": update_data["email"], "id": {"$ne": user_id}}, {"_id": 1}):
+            raise HTTPException(status_code=400, detail="Email already exists")
     if "password" in update_data:
-        update_data["password_hash"] = hash_password(update_data.pop("password"))
+        update_data["password_hash"] = await hash_password(update_data.pop("password"))
     
     if update_data:
-        await db.users.update_one({"id": user_id}, {"$set": update_data})
+        update_data["updated_at"] = datetime.now(timezone.utc)
+        try:
+            await db.users.update_one({"id": user_id}, {"$set": update_data})
+        except DuplicateKeyError:
+            raise HTTPException(status_code=400, detail="Email already exists")
+        user_cache.invalidate(user_id)
         user.update(update_data)
     
-    if 'created_at' in user and isinstance(user['created_at'], str):
-        user['created_at'] = datetime.fromisoformat(user['created_at'])
-    elif 'created_at' not in user:
-        user['created_at'] = datetime.now(timezone.utc)
     return UserResponse(**user)
 
 @api_router.delete("/users/{user_id}")
@@ -357,8 +483,10 @@ async def delete_user(
     current_user: User = Depends(require_role(["administrador"]))
 ):
     result = await db.users.delete_one({"id": user_id})
+    user_cache.invalidate(user_id)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
+    await record_deletion("users", user_id)
     return {"message": "User deleted successfully"}
 
 # ==================== CATEGORY ENDPOINTS ====================
@@ -370,29 +498,29 @@ async def create_category(
 ):
     category = Category(**category_data.model_dump())
     doc = category.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.categories.insert_one(doc)
+    await bump_version(db, "categories")
     return category
 
-@api_router.get("/categories", response_model=List[Category])
-async def get_categories(current_user: User = Depends(get_current_user)):
-    categories = await db.categories.find({}, {"_id": 0}).to_list(1000)
-    for cat in categories:
-        if 'created_at' in cat and isinstance(cat['created_at'], str):
-            cat['created_at'] = datetime.fromisoformat(cat['created_at'])
-        elif 'created_at' not in cat:
-            cat['created_at'] = datetime.now(timezone.utc)
-    return categories
+@api_router.get("/categories", response_model=Page[Category])
+async def get_categories(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    etag = await catalog_etag("categories", request)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    categories, next_cursor = await find_page(db.categories, {}, limit, after, projection=fast_json.projection(Category))
+    return with_etag(page_response(categories, next_cursor, model=Category), response, etag)
 
 @api_router.get("/categories/{category_id}", response_model=Category)
 async def get_category(category_id: str, current_user: User = Depends(get_current_user)):
     category = await db.categories.find_one({"id": category_id}, {"_id": 0})
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
-    if 'created_at' in category and isinstance(category['created_at'], str):
-        category['created_at'] = datetime.fromisoformat(category['created_at'])
-    elif 'created_at' not in category:
-        category['created_at'] = datetime.now(timezone.utc)
     return category
 
 @api_router.put("/categories/{category_id}", response_model=Category)
@@ -406,13 +534,11 @@ async def update_category(
         raise HTTPException(status_code=404, detail="Category not found")
     
     update_data = category_data.model_dump()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     await db.categories.update_one({"id": category_id}, {"$set": update_data})
+    await bump_version(db, "categories")
     category.update(update_data)
     
-    if 'created_at' in category and isinstance(category['created_at'], str):
-        category['created_at'] = datetime.fromisoformat(category['created_at'])
-    elif 'created_at' not in category:
-        category['created_at'] = datetime.now(timezone.utc)
     return category
 
 @api_router.delete("/categories/{category_id}")
@@ -423,6 +549,8 @@ async def delete_category(
     result = await db.categories.delete_one({"id": category_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Category not found")
+    await record_deletion("categories", category_id)
+    await bump_version(db, "categories")
     return {"message": "Category deleted successfully"}
 
 # ==================== SUPPLIER ENDPOINTS ====================
@@ -434,29 +562,29 @@ async def create_supplier(
 ):
     supplier = Supplier(**supplier_data.model_dump())
     doc = supplier.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.suppliers.insert_one(doc)
+    await bump_version(db, "suppliers")
     return supplier
 
-@api_router.get("/suppliers", response_model=List[Supplier])
-async def get_suppliers(current_user: User = Depends(get_current_user)):
-    suppliers = await db.suppliers.find({}, {"_id": 0}).to_list(1000)
-    for sup in suppliers:
-        if 'created_at' in sup and isinstance(sup['created_at'], str):
-            sup['created_at'] = datetime.fromisoformat(sup['created_at'])
-        elif 'created_at' not in sup:
-            sup['created_at'] = datetime.now(timezone.utc)
-    return suppliers
+@api_router.get("/suppliers", response_model=Page[Supplier])
+async def get_suppliers(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    etag = await catalog_etag("suppliers", request)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    suppliers, next_cursor = await find_page(db.suppliers, {}, limit, after, projection=fast_json.projection(Supplier))
+    return with_etag(page_response(suppliers, next_cursor, model=Supplier), response, etag)
 
 @api_router.get("/suppliers/{supplier_id}", response_model=Supplier)
 async def get_supplier(supplier_id: str, current_user: User = Depends(get_current_user)):
     supplier = await db.suppliers.find_one({"id": supplier_id}, {"_id": 0})
     if not supplier:
         raise HTTPException(status_code=404, detail="Supplier not found")
-    if 'created_at' in supplier and isinstance(supplier['created_at'], str):
-        supplier['created_at'] = datetime.fromisoformat(supplier['created_at'])
-    elif 'created_at' not in supplier:
-        supplier['created_at'] = datetime.now(timezone.utc)
     return supplier
 
 @api_router.put("/suppliers/{supplier_id}", response_model=Supplier)
@@ -470,13 +598,11 @@ async def update_supplier(
         raise HTTPException(status_code=404, detail="Supplier not found")
     
     update_data = supplier_data.model_dump()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     await db.suppliers.update_one({"id": supplier_id}, {"$set": update_data})
+    await bump_version(db, "suppliers")
     supplier.update(update_data)
     
-    if 'created_at' in supplier and isinstance(supplier['created_at'], str):
-        supplier['created_at'] = datetime.fromisoformat(supplier['created_at'])
-    elif 'created_at' not in supplier:
-        supplier['created_at'] = datetime.now(timezone.utc)
     return supplier
 
 @api_router.delete("/suppliers/{supplier_id}")
@@ -487,6 +613,8 @@ async def delete_supplier(
     result = await db.suppliers.delete_one({"id": supplier_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Supplier not found")
+    await record_deletion("suppliers", supplier_id)
+    await bump_version(db, "suppliers")
     return {"message": "Supplier deleted successfully"}
 
 # ==================== PRODUCT ENDPOINTS ====================
@@ -498,22 +626,53 @@ async def create_product(
 ):
     product = Product(**product_data.model_dump())
     doc = product.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    if doc['expiration_date']:
-        doc['expiration_date'] = doc['expiration_date'].isoformat()
+    doc['search_name'] = search_key(doc['name'])
     await db.products.insert_one(doc)
+    await bump_version(db, "products")
     return product
 
-@api_router.get("/products", response_model=List[Product])
-async def get_products(current_user: User = Depends(get_current_user)):
-    products = await db.products.find({}, {"_id": 0}).to_list(1000)
-    for prod in products:
-        if 'created_at' in prod and isinstance(prod['created_at'], str):
-            prod['created_at'] = datetime.fromisoformat(prod['created_at'])
-        elif 'created_at' not in prod:
-            prod['created_at'] = datetime.now(timezone.utc)
-        if prod.get('expiration_date') and isinstance(prod['expiration_date'], str):
-            prod['expiration_date'] = datetime.fromisoformat(prod['expiration_date'])
+@api_router.get("/products", response_model=Page[Product])
+async def get_products(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    etag = await catalog_etag("products", request)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    products, next_cursor = await find_page(db.products, {}, limit, after, projection=fast_json.projection(Product))
+    return with_etag(page_response(products, next_cursor, model=Product), response, etag)
+
+# Fields the POS needs to list a product and add it to the cart
+PRODUCT_SEARCH_PROJECTION = {"_id": 0, "id": 1, "name": 1, "description": 1, "price": 1, "stock": 1, "barcode": 1}
+
+@api_router.get("/products/search")
+async def search_products(
+    q: str = "",
+    limit: int = Query(12, ge=1, le=50),
+    in_stock: bool = False,
+    current_user: User = Depends(get_current_user)
+):
+    query = {"active": True}
+    if in_stock:
+        query["stock"] = {"$gt": 0}
+    
+    q = q.strip()
+    if q:
+        # A scanner sends the whole barcode: one probe on the barcode index
+        product = await db.products.find_one({**query, "barcode": q}, PRODUCT_SEARCH_PROJECTION)
+        if product:
+            return [product]
+    
+    prefix = search_key(q)
+    if prefix:
+        query["search_name"] = {"$regex": "^" + re.escape(prefix)}
+    products = await db.products.find(query, PRODUCT_SEARCH_PROJECTION).sort("search_name", 1).limit(limit).to_list(limit)
+    
+    # Exact name matches first, the rest stay in alphabetical order
+    products.sort(key=lambda p: search_key(p['name']) != prefix)
     return products
 
 @api_router.get("/products/{product_id}", response_model=Product)
@@ -521,12 +680,6 @@ async def get_product(product_id: str, current_user: User = Depends(get_current_
     product = await db.products.find_one({"id": product_id}, {"_id": 0})
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
-    if 'created_at' in product and isinstance(product['created_at'], str):
-        product['created_at'] = datetime.fromisoformat(product['created_at'])
-    elif 'created_at' not in product:
-        product['created_at'] = datetime.now(timezone.utc)
-    if product.get('expiration_date') and isinstance(product['expiration_date'], str):
-        product['expiration_date'] = datetime.fromisoformat(product['expiration_date'])
     return product
 
 @api_router.put("/products/{product_id}", response_model=Product)
@@ -540,19 +693,15 @@ async def update_product(
         raise HTTPException(status_code=404, detail="Product not found")
     
     update_data = product_data.model_dump(exclude_unset=True)
-    if 'expiration_date' in update_data and update_data['expiration_date']:
-        update_data['expiration_date'] = update_data['expiration_date'].isoformat()
+    if update_data.get('name'):
+        update_data['search_name'] = search_key(update_data['name'])
     
     if update_data:
+        update_data["updated_at"] = datetime.now(timezone.utc)
         await db.products.update_one({"id": product_id}, {"$set": update_data})
+        await bump_version(db, "products")
         product.update(update_data)
     
-    if 'created_at' in product and isinstance(product['created_at'], str):
-        product['created_at'] = datetime.fromisoformat(product['created_at'])
-    elif 'created_at' not in product:
-        product['created_at'] = datetime.now(timezone.utc)
-    if product.get('expiration_date') and isinstance(product['expiration_date'], str):
-        product['expiration_date'] = datetime.fromisoformat(product['expiration_date'])
     return product
 
 @api_router.delete("/products/{product_id}")
@@ -563,6 +712,8 @@ async def delete_product(
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    await record_deletion("products", product_id)
+    await bump_version(db, "products")
     return {"message": "Product deleted successfully"}
 
 # ==================== CUSTOMER ENDPOINTS ====================
@@ -574,29 +725,29 @@ async def create_customer(
 ):
     customer = Customer(**customer_data.model_dump())
     doc = customer.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.customers.insert_one(doc)
+    await bump_version(db, "customers")
     return customer
 
-@api_router.get("/customers", response_model=List[Customer])
-async def get_customers(current_user: User = Depends(get_current_user)):
-    customers = await db.customers.find({}, {"_id": 0}).to_list(1000)
-    for cust in customers:
-        if 'created_at' in cust and isinstance(cust['created_at'], str):
-            cust['created_at'] = datetime.fromisoformat(cust['created_at'])
-        elif 'created_at' not in cust:
-            cust['created_at'] = datetime.now(timezone.utc)
-    return customers
+@api_router.get("/customers", response_model=Page[Customer])
+async def get_customers(
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    etag = await catalog_etag("customers", request)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    customers, next_cursor = await find_page(db.customers, {}, limit, after, projection=fast_json.projection(Customer))
+    return with_etag(page_response(customers, next_cursor, model=Customer), response, etag)
 
 @api_router.get("/customers/{customer_id}", response_model=Customer)
 async def get_customer(customer_id: str, current_user: User = Depends(get_current_user)):
     customer = await db.customers.find_one({"id": customer_id}, {"_id": 0})
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    if 'created_at' in customer and isinstance(customer['created_at'], str):
-        customer['created_at'] = datetime.fromisoformat(customer['created_at'])
-    elif 'created_at' not in customer:
-        customer['created_at'] = datetime.now(timezone.utc)
     return customer
 
 @api_router.put("/customers/{customer_id}", response_model=Customer)
@@ -610,13 +761,11 @@ async def update_customer(
         raise HTTPException(status_code=404, detail="Customer not found")
     
     update_data = customer_data.model_dump()
+    update_data["updated_at"] = datetime.now(timezone.utc)
     await db.customers.update_one({"id": customer_id}, {"$set": update_data})
+    await bump_version(db, "customers")
     customer.update(update_data)
     
-    if 'created_at' in customer and isinstance(customer['created_at'], str):
-        customer['created_at'] = datetime.fromisoformat(customer['created_at'])
-    elif 'created_at' not in customer:
-        customer['created_at'] = datetime.now(timezone.utc)
     return customer
 
 @api_router.delete("/customers/{customer_id}")
@@ -627,10 +776,142 @@ async def delete_customer(
     result = await db.customers.delete_one({"id": customer_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Customer not found")
+    await record_deletion("customers", customer_id)
+    await bump_version(db, "customers")
     return {"message": "Customer deleted successfully"}
 
 # ==================== SALE ENDPOINTS ====================
 
+def sale_quantities(details: List[SaleDetail]) -> dict:
+    # Total quantity per product, a product may appear in several lines
+    quantities = {}
+    for detail in details:
+        quantities[detail.product_id] = quantities.get(detail.product_id, 0) + detail.quantity
+    return quantities
+
+async def stock_shortage(quantities: dict, names: dict, session=None) -> HTTPException:
+    # Which line of a refused decrement failed: a missing product or one
+    # without enough stock, in line order
+    products = await db.products.find(
+        {"id": {"$in": list(quantities)}}, {"_id": 0, "id": 1, "stock": 1}, session=session
+    ).to_list(None)
+    stock = {product["id"]: product.get("stock", 0) for product in products}
+    for pid, quantity in quantities.items():
+        if pid not in stock:
+            return HTTPException(status_code=404, detail=f"Product not found: {names[pid]}")
+        if stock[pid] < quantity:
+            return HTTPException(status_code=400, detail=f"Insufficient stock for {names[pid]}")
+    return HTTPException(status_code=409, detail="Stock changed during the sale, try again")
+
+async def decrement_stock(details: List[SaleDetail], session=None):
+    # Each line is a conditional $inc that only matches while there is enough
+    # stock; nothing is ever upserted. Inside a transaction the lines go in one
+    # bulk_write and a short matched_count aborts it. Without one, the lines
+    # are sent as concurrent update_one calls: a bulk_write only reports the
+    # total matched_count, so after a short count there would be no way to
+    # tell which lines were applied and must be reverted before refusing the
+    # sale. The calls share the pool and run in parallel, so the happy path
+    # costs one round trip of latency; restore_stock only runs on a refusal.
+    quantities = sale_quantities(details)
+    names = {detail.product_id: detail.product_name for detail in reversed(details)}
+    if not quantities:
+        return
+    now = datetime.now(timezone.utc)
+    
+    def stock_filter(pid):
+        return {"id": pid, "stock": {"$gte": quantities[pid]}}
+    
+    def stock_update(pid):
+        return {"$inc": {"stock": -quantities[pid]}, "$set": {"updated_at": now}}
+    
+    if session is not None:
+        result = await db.products.bulk_write(
+            [UpdateOne(stock_filter(pid), stock_update(pid)) for pid in quantities], ordered=True, session=session
+        )
+        if result.matched_count != len(quantities):
+            raise await stock_shortage(quantities, names, session)
+        # The caller bumps the products version once the transaction commits
+        return
+    
+    results = await asyncio.gather(
+        *(db.products.update_one(stock_filter(pid), stock_update(pid)) for pid in quantities),
+        return_exceptions=True
+    )
+    applied = {pid: quantities[pid] for pid, result in zip(quantities, results)
+               if not isinstance(result, BaseException) and result.matched_count}
+    await bump_version(db, "products")
+    if len(applied) == len(quantities):
+        return
+    
+    await restore_stock(applied)
+    error = next((result for result in results if isinstance(result, BaseException)), None)
+    if error is not None:
+        raise HTTPException(status_code=500, detail=f"Stock update failed: {error}")
+    raise await stock_shortage({pid: q for pid, q in quantities.items() if pid not in applied}, names)
+
+async def restore_stock(quantities: dict):
+    now = datetime.now(timezone.utc)
+    operations = [
+        UpdateOne({"id": pid}, {"$inc": {"stock": quantity}, "$set": {"updated_at": now}})
+        for pid, quantity in quantities.items()
+    ]
+    if operations:
+        await db.products.bulk_write(operations, ordered=False)
+        await bump_version(db, "products")
+
+async def update_sale_rollups(sale_doc: dict):
+    # Every sale of the day $incs the same documents; they stay out of the
+    # sale transaction so concurrent checkouts don't conflict on them
+    day_filter, day_update = daily_sales_update(sale_doc)
+    product_updates = product_sales_updates(sale_doc)
+    try:
+        await asyncio.gather(
+            db.daily_sales.update_one(day_filter, day_update, upsert=True),
+            *([db.product_sales.bulk_write(product_updates, ordered=False)] if product_updates else [])
+        )
+    except Exception as e:
+        # The sale is already recorded; rollups.py can rebuild the rollups
+        logger.error(f"Rollup update failed for sale {sale_doc['id']}: {e}")
+
+async def save_sale(sale_doc: dict, movement_docs: List[dict], details: List[SaleDetail]):
+    # Stock, sale and movements are written together. With transactions the
+    # stock decrement and the inserts commit or abort as one. Without them the
+    # writes go one after the other (stock, sale, movements) and a failure
+    # undoes what was already written, so the client can retry without
+    # leaving a duplicate sale or lost stock behind. The rollups are updated
+    # once the sale is stored.
+    if use_transactions:
+        async def write_sale(session):
+            await decrement_stock(details, session=session)
+            await db.sales.insert_one(sale_doc, session=session)
+            if movement_docs:
+                await db.inventory_movements.insert_many(movement_docs, session=session)
+        
+        # with_transaction runs write_sale again on TransientTransactionError
+        # (write conflicts between checkouts) and retries an unknown commit
+        async with await client.start_session() as session:
+            await session.with_transaction(write_sale)
+        # Only after the commit: a catalog read in between would otherwise
+        # cache the new version with the old stock
+        await bump_version(db, "products")
+        await update_sale_rollups(sale_doc)
+        return
+    
+    await decrement_stock(details)
+    try:
+        await db.sales.insert_one(sale_doc)
+        if movement_docs:
+            await db.inventory_movements.insert_many(movement_docs)
+    except Exception:
+        try:
+            await db.inventory_movements.delete_many({"id": {"$in": [doc["id"] for doc in movement_docs]}})
+            await db.sales.delete_one({"id": sale_doc["id"]})
+            await restore_stock(sale_quantities(details))
+        except Exception as e:
+            logger.error(f"Could not undo the partial sale {sale_doc['id']}: {e}")
+        raise
+    await update_sale_rollups(sale_doc)
+
 @api_router.post("/sales", response_model=Sale)
 async def create_sale(
     sale_data: SaleCreate,
@@ -653,56 +934,45 @@ async def create_sale(
         payment_method=sale_data.payment_method
     )
     
-    # Update product stock
+    # Create inventory movements
+    movement_docs = []
     for detail in sale_data.details:
-        product = await db.products.find_one({"id": detail.product_id}, {"_id": 0})
-        if product:
-            new_stock = product['stock'] - detail.quantity
-            await db.products.update_one({"id": detail.product_id}, {"$set": {"stock": new_stock}})
-            
-            # Create inventory movement
-            movement = InventoryMovement(
-                product_id=detail.product_id,
-                product_name=detail.product_name,
-                movement_type="salida",
-                quantity=detail.quantity,
-                reason=f"Venta #{sale.id[:8]}",
-                user_id=current_user.id,
-                user_name=current_user.full_name
-            )
-            movement_doc = movement.model_dump()
-            movement_doc['created_at'] = movement_doc['created_at'].isoformat()
-            await db.inventory_movements.insert_one(movement_doc)
+        movement = InventoryMovement(
+            product_id=detail.product_id,
+            product_name=detail.product_name,
+            movement_type="salida",
+            quantity=detail.quantity,
+            reason=f"Venta #{sale.id[:8]}",
+            user_id=current_user.id,
+            user_name=current_user.full_name
+        )
+        movement_doc = movement.model_dump()
+        movement_docs.append(movement_doc)
     
-    doc = sale.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.sales.insert_one(doc)
+    # Updates the stock too, see save_sale
+    await save_sale(sale.model_dump(), movement_docs, sale_data.details)
     return sale
 
-@api_router.get("/sales", response_model=List[Sale])
-async def get_sales(current_user: User = Depends(get_current_user)):
-    sales = await db.sales.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+@api_router.get("/sales", response_model=Page[Sale])
+async def get_sales(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    sales, next_cursor = await find_page(db.sales, {}, limit, after, projection=fast_json.projection(Sale))
     for sale in sales:
-        if 'created_at' in sale and isinstance(sale['created_at'], str):
-            sale['created_at'] = datetime.fromisoformat(sale['created_at'])
-        elif 'created_at' not in sale:
-            sale['created_at'] = datetime.now(timezone.utc)
         # Agregar user_name si no existe
         if 'user_name' not in sale:
             sale['user_name'] = "Vendedor"
         if 'customer_name' not in sale:
             sale['customer_name'] = "Cliente"
-    return sales
+    return page_response(sales, next_cursor, model=Sale)
 
 @api_router.get("/sales/{sale_id}", response_model=Sale)
 async def get_sale(sale_id: str, current_user: User = Depends(get_current_user)):
     sale = await db.sales.find_one({"id": sale_id}, {"_id": 0})
     if not sale:
         raise HTTPException(status_code=404, detail="Sale not found")
-    if 'created_at' in sale and isinstance(sale['created_at'], str):
-        sale['created_at'] = datetime.fromisoformat(sale['created_at'])
-    elif 'created_at' not in sale:
-        sale['created_at'] = datetime.now(timezone.utc)
     # Agregar user_name si no existe
     if 'user_name' not in sale:
         sale['user_name'] = "Vendedor"
@@ -739,436 +1009,479 @@ async def create_inventory_movement(
     else:  # ajuste
         new_stock = movement_data.quantity
     
-    await db.products.update_one({"id": movement_data.product_id}, {"$set": {"stock": new_stock}})
+    await db.products.update_one({"id": movement_data.product_id}, {"$set": {"stock": new_stock, "updated_at": datetime.now(timezone.utc)}})
+    await bump_version(db, "products")
     
     doc = movement.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
     await db.inventory_movements.insert_one(doc)
     return movement
 
-@api_router.get("/inventory-movements", response_model=List[InventoryMovement])
-async def get_inventory_movements(current_user: User = Depends(get_current_user)):
-    movements = await db.inventory_movements.find({}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    for mov in movements:
-        if 'created_at' in mov and isinstance(mov['created_at'], str):
-            mov['created_at'] = datetime.fromisoformat(mov['created_at'])
-        elif 'created_at' not in mov:
-            mov['created_at'] = datetime.now(timezone.utc)
-    return movements
+@api_router.get("/inventory-movements", response_model=Page[InventoryMovement])
+async def get_inventory_movements(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    movements, next_cursor = await find_page(
+        db.inventory_movements, {}, limit, after, projection=fast_json.projection(InventoryMovement)
+    )
+    return page_response(movements, next_cursor, model=InventoryMovement)
 
 # ==================== DASHBOARD ENDPOINTS ====================
 
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats(current_user: User = Depends(get_current_user)):
-    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # Total sales today
-    sales_today = await db.sales.find({
-        "created_at": {"$gte": today.isoformat()}
-    }, {"_id": 0}).to_list(1000)
-    total_sales_today = sum(sale['total'] for sale in sales_today)
-    
-    # Low stock products
-    products = await db.products.find({}, {"_id": 0}).to_list(1000)
-    low_stock_count = len([p for p in products if p['stock'] <= p['min_stock'] and p['active']])
-    
-    # Total products
-    total_products = len([p for p in products if p['active']])
-    
-    # Total customers
-    total_customers = await db.customers.count_documents({})
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    first_day_month = today[:8] + "01"
     
-    # Sales this month
-    first_day_month = today.replace(day=1)
-    sales_month = await db.sales.find({
-        "created_at": {"$gte": first_day_month.isoformat()}
-    }, {"_id": 0}).to_list(1000)
-    total_sales_month = sum(sale['total'] for sale in sales_month)
+    # At most 31 daily_sales documents for the month totals
+    month_days, low_stock_count, total_products, total_customers = await asyncio.gather(
+        db.daily_sales.find({"date": {"$gte": first_day_month}}, {"_id": 0, "date": 1, "total": 1, "count": 1}).to_list(None),
+        db.products.count_documents({"active": True, "$expr": {"$lte": ["$stock", "$min_stock"]}}),
+        db.products.count_documents({"active": True}),
+        db.customers.estimated_document_count()
+    )
+    today_totals = next((day for day in month_days if day['date'] == today), {})
     
     return {
-        "total_sales_today": round(total_sales_today, 2),
+        "total_sales_today": round(today_totals.get("total", 0), 2),
         "low_stock_count": low_stock_count,
         "total_products": total_products,
         "total_customers": total_customers,
-        "total_sales_month": round(total_sales_month, 2),
-        "sales_count_today": len(sales_today)
+        "total_sales_month": round(sum(day['total'] for day in month_days), 2),
+        "sales_count_today": today_totals.get("count", 0)
     }
 
 @api_router.get("/dashboard/sales-chart")
 async def get_sales_chart(current_user: User = Depends(get_current_user)):
-    # Get last 30 days of sales
-    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
-    sales = await db.sales.find({
-        "created_at": {"$gte": thirty_days_ago.isoformat()}
-    }, {"_id": 0}).to_list(1000)
-    
-    # Group by date
-    sales_by_date = {}
-    for sale in sales:
-        date_str = sale['created_at'][:10] if isinstance(sale['created_at'], str) else sale['created_at'].isoformat()[:10]
-        if date_str not in sales_by_date:
-            sales_by_date[date_str] = 0
-        sales_by_date[date_str] += sale['total']
-    
-    # Sort by date
-    sorted_data = sorted(sales_by_date.items())
+    # Last 30 days from the daily rollup, already grouped and sorted by date
+    thirty_days_ago = (datetime.now(timezone.utc) - timedelta(days=30)).strftime("%Y-%m-%d")
+    days = await db.daily_sales.find(
+        {"date": {"$gte": thirty_days_ago}}, {"_id": 0, "date": 1, "total": 1}
+    ).sort("date", 1).to_list(None)
     
     return {
-        "labels": [item[0] for item in sorted_data],
-        "values": [round(item[1], 2) for item in sorted_data]
+        "labels": [day['date'] for day in days],
+        "values": [round(day['total'], 2) for day in days]
     }
 
-@api_router.get("/dashboard/top-products")
-async def get_top_products(current_user: User = Depends(get_current_user)):
-    sales = await db.sales.find({}, {"_id": 0}).to_list(1000)
-    
-    # Count product quantities
-    product_quantities = {}
-    for sale in sales:
-        for detail in sale['details']:
-            if detail['product_id'] not in product_quantities:
-                product_quantities[detail['product_id']] = {
-                    'name': detail['product_name'],
-                    'quantity': 0
-                }
-            product_quantities[detail['product_id']]['quantity'] += detail['quantity']
-    
-    # Sort by quantity
-    sorted_products = sorted(product_quantities.items(), key=lambda x: x[1]['quantity'], reverse=True)[:10]
+async def top_selling_products(limit: int, start_date: Optional[str] = None, end_date: Optional[str] = None, period: str = ALL_TIME):
+    # Ad-hoc date ranges are aggregated by Mongo; the all-time and current
+    # month rankings read the product_sales counters kept by create_sale
+    if start_date and end_date:
+        pipeline = [
+            {"$match": created_at_range(start_date, end_date)},
+            {"$unwind": "$details"},
+            {"$group": {
+                "_id": "$details.product_id",
+                "name": {"$first": "$details.product_name"},
+                "quantity": {"$sum": "$details.quantity"},
+                "revenue": {"$sum": "$details.subtotal"}
+            }},
+            {"$sort": {"quantity": -1}},
+            {"$limit": limit},
+            {"$project": {"_id": 0, "product_id": "$_id", "name": 1, "quantity": 1, "revenue": 1}}
+        ]
+        return await db.sales.aggregate(pipeline, allowDiskUse=True).to_list(limit)
     
+    if period != ALL_TIME:
+        period = month_key(datetime.now(timezone.utc))
+    return await db.product_sales.find(
+        {"period": period}, {"_id": 0, "product_id": 1, "name": 1, "quantity": 1, "revenue": 1}
+    ).sort("quantity", -1).limit(limit).to_list(limit)
+
+@api_router.get("/dashboard/top-products")
+async def get_top_products(
+    period: str = Query(ALL_TIME, pattern="^(all|month)$"),
+    current_user: User = Depends(get_current_user)
+):
+    top_products = await top_selling_products(10, period=period)
     return {
-        "labels": [item[1]['name'] for item in sorted_products],
-        "values": [item[1]['quantity'] for item in sorted_products]
+        "labels": [product['name'] for product in top_products],
+        "values": [product['quantity'] for product in top_products]
     }
 
 # ==================== REPORT ENDPOINTS ====================
 
+def parse_date_param(value: str, end_of_day: bool = False) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    # A bare date as the end of a range includes that whole day
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1, microseconds=-1)
+    return parsed
+
+def created_at_range(start_date: Optional[str], end_date: Optional[str]) -> dict:
+    if start_date and end_date:
+        return {"created_at": {"$gte": parse_date_param(start_date), "$lte": parse_date_param(end_date, end_of_day=True)}}
+    return {}
+
+# Documents per round trip while streaming an export
+EXPORT_BATCH_SIZE = 500
+
+def format_date(value) -> str:
+    return value.strftime('%Y-%m-%d') if isinstance(value, datetime) else str(value)[:10]
+
+def export_format(export: bool, output_format: str) -> Optional[str]:
+    """Download format for a report request, None for the regular JSON response."""
+    if output_format != "json":
+        return output_format
+    # export=true predates format= and always meant Excel
+    return "xlsx" if export else None
+
+# Report rows, shared by every export format. Keys are the column titles;
+# the *_COLUMNS dicts declare their types for the Parquet schema.
+
+SALES_REPORT_COLUMNS = {
+    'Fecha': 'string', 'ID Venta': 'string', 'Cliente': 'string', 'Producto': 'string', 'Cantidad': 'int',
+    'Precio Unitario': 'float', 'Subtotal': 'float', 'Total Venta': 'float', 'Vendedor': 'string',
+}
+INVENTORY_REPORT_COLUMNS = {
+    'Código': 'string', 'Nombre': 'string', 'Categoría': 'string', 'Proveedor': 'string', 'Precio': 'float',
+    'Costo': 'float', 'Stock': 'int', 'Stock Mínimo': 'int', 'Estado Stock': 'string',
+}
+EXPIRING_PRODUCTS_COLUMNS = {
+    'Código': 'string', 'Nombre': 'string', 'Fecha Vencimiento': 'string', 'Días hasta vencer': 'int',
+    'Stock': 'int', 'Precio': 'float',
+}
+TOP_SELLING_COLUMNS = {'Producto': 'string', 'Cantidad Vendida': 'int', 'Ingresos Generados': 'float'}
+INVENTORY_MOVEMENTS_COLUMNS = {
+    'Fecha': 'string', 'Producto': 'string', 'Tipo': 'string', 'Cantidad': 'int', 'Razón': 'string',
+    'Usuario': 'string',
+}
+TRANSACTIONS_COLUMNS = {
+    'Fecha': 'string', 'ID Transacción': 'string', 'Cliente': 'string', 'Subtotal': 'float', 'Impuesto': 'float',
+    'Descuento': 'float', 'Total': 'float', 'Método de Pago': 'string', 'Vendedor': 'string',
+}
+
+async def sales_report_rows(query: dict):
+    # One row per sale line, straight from the cursor
+    cursor = db.sales.find(query, {"_id": 0}).sort("created_at", -1).batch_size(EXPORT_BATCH_SIZE)
+    async for sale in cursor:
+        for detail in sale['details']:
+            yield {
+                'Fecha': format_date(sale['created_at']),
+                'ID Venta': sale['id'][:8],
+                'Cliente': sale.get('customer_name', "Cliente"),
+                'Producto': detail['product_name'],
+                'Cantidad': detail['quantity'],
+                'Precio Unitario': detail['unit_price'],
+                'Subtotal': detail['subtotal'],
+                'Total Venta': sale['total'],
+                'Vendedor': sale.get('user_name', "Vendedor")
+            }
+
+def lookup_name(collection_name: str, local_field: str, as_field: str) -> list:
+    # Only the name is kept from the joined document; the lookup uses the id index
+    return [
+        {"$lookup": {"from": collection_name, "localField": local_field, "foreignField": "id", "as": as_field}},
+        {"$set": {as_field: {"$ifNull": [{"$arrayElemAt": [f"${as_field}.name", 0]}, "N/A"]}}},
+    ]
+
+# Inventory report rows built in Mongo: one $lookup per name and only the
+# exported columns come back
+INVENTORY_REPORT_PIPELINE = [
+    {"$match": {"active": True}},
+    {"$project": {"_id": 0, "id": 1, "name": 1, "category_id": 1, "supplier_id": 1,
+                  "price": 1, "cost": 1, "stock": 1, "min_stock": 1}},
+    *lookup_name("categories", "category_id", "category"),
+    *lookup_name("suppliers", "supplier_id", "supplier"),
+    {"$project": {
+        "Código": {"$substrCP": ["$id", 0, 8]},
+        "Nombre": "$name",
+        "Categoría": "$category",
+        "Proveedor": "$supplier",
+        "Precio": "$price",
+        "Costo": "$cost",
+        "Stock": "$stock",
+        "Stock Mínimo": "$min_stock",
+        "Estado Stock": {"$cond": [{"$lte": ["$stock", "$min_stock"]}, "Bajo", "Normal"]},
+    }},
+]
+
+async def inventory_report_rows():
+    async for row in db.products.aggregate(INVENTORY_REPORT_PIPELINE, batchSize=EXPORT_BATCH_SIZE):
+        yield row
+
+def expiring_products_cursor(today: datetime, days: int):
+    # Range on the active_expiration_date index, soonest first
+    query = {"active": True, "expiration_date": {"$gte": today, "$lte": today + timedelta(days=days)}}
+    return db.products.find(query, {"_id": 0, "search_name": 0}).sort("expiration_date", 1)
+
+async def expiring_products_rows(today: datetime, days: int):
+    async for product in expiring_products_cursor(today, days).batch_size(EXPORT_BATCH_SIZE):
+        yield {
+            'Código': product['id'][:8],
+            'Nombre': product['name'],
+            'Fecha Vencimiento': product['expiration_date'].strftime('%Y-%m-%d'),
+            'Días hasta vencer': (product['expiration_date'] - today).days,
+            'Stock': product['stock'],
+            'Precio': product['price']
+        }
+
+async def top_selling_rows(top_products: List[dict]):
+    for stats in top_products:
+        yield {
+            'Producto': stats['name'],
+            'Cantidad Vendida': stats['quantity'],
+            'Ingresos Generados': round(stats['revenue'], 2)
+        }
+
+async def inventory_movements_rows(query: dict):
+    cursor = db.inventory_movements.find(query, {"_id": 0}).sort("created_at", -1).batch_size(EXPORT_BATCH_SIZE)
+    async for movement in cursor:
+        yield {
+            'Fecha': format_date(movement['created_at']),
+            'Producto': movement['product_name'],
+            'Tipo': movement['movement_type'].capitalize(),
+            'Cantidad': movement['quantity'],
+            'Razón': movement['reason'],
+            'Usuario': movement['user_name']
+        }
+
+async def transactions_rows(query: dict):
+    # The line details are not exported, leave them in Mongo
+    cursor = db.sales.find(query, {"_id": 0, "details": 0}).sort("created_at", -1).batch_size(EXPORT_BATCH_SIZE)
+    async for sale in cursor:
+        yield {
+            'Fecha': format_date(sale['created_at']),
+            'ID Transacción': sale['id'][:8],
+            'Cliente': sale.get('customer_name', "Cliente"),
+            'Subtotal': sale['subtotal'],
+            'Impuesto': sale['tax'],
+            'Descuento': sale['discount'],
+            'Total': sale['total'],
+            'Método de Pago': sale['payment_method'].capitalize(),
+            'Vendedor': sale.get('user_name', "Vendedor")
+        }
+
 @api_router.get("/reports/sales-report")
 async def get_sales_report(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     export: bool = False,
+    output_format: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    query = {}
-    if start_date and end_date:
-        query["created_at"] = {"$gte": start_date, "$lte": end_date}
-    
-    sales = await db.sales.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    query = created_at_range(start_date, end_date)
     
-    if export:
-        # Export to Excel
-        data = []
-        for sale in sales:
-            for detail in sale['details']:
-                data.append({
-                    'Fecha': sale['created_at'][:10] if isinstance(sale['created_at'], str) else sale['created_at'].isoformat()[:10],
-                    'ID Venta': sale['id'][:8],
-                    'Cliente': sale['customer_name'],
-                    'Producto': detail['product_name'],
-                    'Cantidad': detail['quantity'],
-                    'Precio Unitario': detail['unit_price'],
-                    'Subtotal': detail['subtotal'],
-                    'Total Venta': sale['total'],
-                    'Vendedor': sale['user_name']
-                })
-        
-        df = pd.DataFrame(data)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Ventas', index=False)
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': 'attachment; filename=reporte_ventas.xlsx'}
-        )
+    download = export_format(export, output_format)
+    if download:
+        return await export_response(sales_report_rows(query), download, 'Ventas', 'reporte_ventas', SALES_REPORT_COLUMNS)
     
-    return sales
+    sales, next_cursor = await find_page(db.sales, query, limit, after)
+    return page_response(sales, next_cursor)
 
 @api_router.get("/reports/inventory-report")
 async def get_inventory_report(
     export: bool = False,
+    output_format: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    products = await db.products.find({"active": True}, {"_id": 0}).to_list(1000)
-    
-    if export:
-        # Get category and supplier names
-        categories = {c['id']: c['name'] for c in await db.categories.find({}, {"_id": 0}).to_list(1000)}
-        suppliers = {s['id']: s['name'] for s in await db.suppliers.find({}, {"_id": 0}).to_list(1000)}
-        
-        data = []
-        for product in products:
-            data.append({
-                'Código': product['id'][:8],
-                'Nombre': product['name'],
-                'Categoría': categories.get(product['category_id'], 'N/A'),
-                'Proveedor': suppliers.get(product['supplier_id'], 'N/A'),
-                'Precio': product['price'],
-                'Costo': product['cost'],
-                'Stock': product['stock'],
-                'Stock Mínimo': product['min_stock'],
-                'Estado Stock': 'Bajo' if product['stock'] <= product['min_stock'] else 'Normal'
-            })
-        
-        df = pd.DataFrame(data)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Inventario', index=False)
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': 'attachment; filename=reporte_inventario.xlsx'}
-        )
+    download = export_format(export, output_format)
+    if download:
+        return await export_response(inventory_report_rows(), download, 'Inventario', 'reporte_inventario', INVENTORY_REPORT_COLUMNS)
     
-    return products
+    products, next_cursor = await find_page(db.products, {"active": True}, limit, after, projection={"_id": 0, "search_name": 0})
+    return page_response(products, next_cursor)
 
 @api_router.get("/reports/expiring-products")
 async def get_expiring_products(
     days: int = 30,
     export: bool = False,
+    output_format: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
     current_user: User = Depends(get_current_user)
 ):
     today = datetime.now(timezone.utc)
-    future_date = today + timedelta(days=days)
-    
-    products = await db.products.find({
-        "active": True,
-        "expiration_date": {"$ne": None}
-    }, {"_id": 0}).to_list(1000)
     
-    expiring_products = []
-    for product in products:
-        exp_date_str = product.get('expiration_date')
-        if exp_date_str:
-            exp_date = datetime.fromisoformat(exp_date_str) if isinstance(exp_date_str, str) else exp_date_str
-            if today <= exp_date <= future_date:
-                product['expiration_date'] = exp_date
-                expiring_products.append(product)
+    download = export_format(export, output_format)
+    if download:
+        rows = expiring_products_rows(today, days)
+        return await export_response(rows, download, 'Productos por Vencer', 'reporte_productos_vencer', EXPIRING_PRODUCTS_COLUMNS)
     
-    if export:
-        data = []
-        for product in expiring_products:
-            days_until_expiry = (product['expiration_date'] - today).days
-            data.append({
-                'Código': product['id'][:8],
-                'Nombre': product['name'],
-                'Fecha Vencimiento': product['expiration_date'].strftime('%Y-%m-%d'),
-                'Días hasta vencer': days_until_expiry,
-                'Stock': product['stock'],
-                'Precio': product['price']
-            })
-        
-        df = pd.DataFrame(data)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Productos por Vencer', index=False)
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': 'attachment; filename=reporte_productos_vencer.xlsx'}
-        )
-    
-    return expiring_products
+    return await expiring_products_cursor(today, days).to_list(None)
+
+@api_router.get("/reports/expiry-buckets")
+async def get_expiry_buckets(
+    bucket: Optional[str] = Query(None, pattern="^(expired|0-30|31-90|91-180)$"),
+    current_user: User = Depends(get_current_user)
+):
+    # Precomputed by the expiry refresh task (see expiry.py): products, units
+    # and value at cost per bucket, plus the products of one bucket if asked
+    summary = await expiry_summary(db)
+    if bucket:
+        summary["products"] = await db.expiry_buckets.find(
+            {"bucket": bucket}, {"_id": 0}
+        ).sort("expiration_date", 1).to_list(None)
+    return summary
 
 @api_router.get("/reports/top-selling")
 async def get_top_selling(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    period: str = Query(ALL_TIME, pattern="^(all|month)$"),
     export: bool = False,
+    output_format: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
     current_user: User = Depends(get_current_user)
 ):
-    query = {}
-    if start_date and end_date:
-        query["created_at"] = {"$gte": start_date, "$lte": end_date}
-    
-    sales = await db.sales.find(query, {"_id": 0}).to_list(1000)
-    
-    # Count product quantities and revenue
-    product_stats = {}
-    for sale in sales:
-        for detail in sale['details']:
-            if detail['product_id'] not in product_stats:
-                product_stats[detail['product_id']] = {
-                    'name': detail['product_name'],
-                    'quantity': 0,
-                    'revenue': 0
-                }
-            product_stats[detail['product_id']]['quantity'] += detail['quantity']
-            product_stats[detail['product_id']]['revenue'] += detail['subtotal']
-    
-    # Sort by quantity
-    sorted_products = sorted(product_stats.items(), key=lambda x: x[1]['quantity'], reverse=True)[:limit]
+    top_products = await top_selling_products(limit, start_date, end_date, period)
     
-    if export:
-        data = []
-        for product_id, stats in sorted_products:
-            data.append({
-                'Producto': stats['name'],
-                'Cantidad Vendida': stats['quantity'],
-                'Ingresos Generados': round(stats['revenue'], 2)
-            })
-        
-        df = pd.DataFrame(data)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Productos Más Vendidos', index=False)
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': 'attachment; filename=reporte_mas_vendidos.xlsx'}
-        )
+    download = export_format(export, output_format)
+    if download:
+        rows = top_selling_rows(top_products)
+        return await export_response(rows, download, 'Productos Más Vendidos', 'reporte_mas_vendidos', TOP_SELLING_COLUMNS)
     
-    return [{'product_id': pid, **stats} for pid, stats in sorted_products]
+    return top_products
 
 @api_router.get("/reports/inventory-movements")
 async def get_inventory_movements_report(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     export: bool = False,
+    output_format: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    query = {}
-    if start_date and end_date:
-        query["created_at"] = {"$gte": start_date, "$lte": end_date}
+    query = created_at_range(start_date, end_date)
     
-    movements = await db.inventory_movements.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    download = export_format(export, output_format)
+    if download:
+        return await export_response(inventory_movements_rows(query), download, 'Movimientos', 'reporte_movimientos', INVENTORY_MOVEMENTS_COLUMNS)
     
-    if export:
-        data = []
-        for movement in movements:
-            data.append({
-                'Fecha': movement['created_at'][:10] if isinstance(movement['created_at'], str) else movement['created_at'],
-                'Producto': movement['product_name'],
-                'Tipo': movement['movement_type'].capitalize(),
-                'Cantidad': movement['quantity'],
-                'Razón': movement['reason'],
-                'Usuario': movement['user_name']
-            })
-        
-        df = pd.DataFrame(data)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Movimientos', index=False)
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': 'attachment; filename=reporte_movimientos.xlsx'}
-        )
-    
-    return movements
+    movements, next_cursor = await find_page(db.inventory_movements, query, limit, after)
+    return page_response(movements, next_cursor)
 
 @api_router.get("/reports/transactions")
 async def get_transactions_report(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     export: bool = False,
+    output_format: str = Query("json", alias="format", pattern=FORMAT_PATTERN),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
-    query = {}
-    if start_date and end_date:
-        query["created_at"] = {"$gte": start_date, "$lte": end_date}
-    
-    sales = await db.sales.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    query = created_at_range(start_date, end_date)
     
-    if export:
-        data = []
-        for sale in sales:
-            data.append({
-                'Fecha': sale['created_at'][:10] if isinstance(sale['created_at'], str) else sale['created_at'],
-                'ID Transacción': sale['id'][:8],
-                'Cliente': sale['customer_name'],
-                'Subtotal': sale['subtotal'],
-                'Impuesto': sale['tax'],
-                'Descuento': sale['discount'],
-                'Total': sale['total'],
-                'Método de Pago': sale['payment_method'].capitalize(),
-                'Vendedor': sale['user_name']
-            })
-        
-        df = pd.DataFrame(data)
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-            df.to_excel(writer, sheet_name='Transacciones', index=False)
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': 'attachment; filename=reporte_transacciones.xlsx'}
-        )
+    download = export_format(export, output_format)
+    if download:
+        return await export_response(transactions_rows(query), download, 'Transacciones', 'reporte_transacciones', TRANSACTIONS_COLUMNS)
     
-    return sales
+    sales, next_cursor = await find_page(db.sales, query, limit, after)
+    return page_response(sales, next_cursor)
 
 # ==================== DATABASE BACKUP/RESTORE ====================
 
 @api_router.get("/database/backup")
-async def backup_database(current_user: User = Depends(require_role(["administrador"]))):
-    try:
-        # Export all collections
-        backup_data = {
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            'users': await db.users.find({}, {"_id": 0}).to_list(1000),
-            'categories': await db.categories.find({}, {"_id": 0}).to_list(1000),
-            'suppliers': await db.suppliers.find({}, {"_id": 0}).to_list(1000),
-            'products': await db.products.find({}, {"_id": 0}).to_list(1000),
-            'customers': await db.customers.find({}, {"_id": 0}).to_list(1000),
-            'sales': await db.sales.find({}, {"_id": 0}).to_list(1000),
-            'inventory_movements': await db.inventory_movements.find({}, {"_id": 0}).to_list(1000)
-        }
-        
-        # Convert datetime objects to strings
-        def convert_datetime(obj):
-            if isinstance(obj, dict):
-                return {k: convert_datetime(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_datetime(item) for item in obj]
-            elif isinstance(obj, datetime):
-                return obj.isoformat()
-            return obj
-        
-        backup_data = convert_datetime(backup_data)
-        
-        import json
-        json_data = json.dumps(backup_data, indent=2, ensure_ascii=False)
-        
-        return StreamingResponse(
-            io.BytesIO(json_data.encode('utf-8')),
-            media_type='application/json',
-            headers={'Content-Disposition': f'attachment; filename=backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'}
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Backup failed: {str(e)}")
+async def backup_database(
+    incremental: bool = False,
+    base: Optional[str] = None,
+    current_user: User = Depends(require_role(["administrador"]))
+):
+    # gzip NDJSON streamed straight from the cursors, see backup.py for the
+    # format. An incremental backup holds what changed since the backup `base`
+    # (by default the latest one taken)
+    backup_base = None
+    if incremental:
+        try:
+            backup_base = await find_backup_base(db, base)
+        except BackupError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        iter_backup(db, base=backup_base),
+        media_type=BACKUP_MEDIA_TYPE,
+        headers={'Content-Disposition': f'attachment; filename={backup_filename(incremental=incremental)}'}
+    )
 
 @api_router.post("/database/restore")
 async def restore_database(
-    backup_file: dict,
+    request: Request,
     current_user: User = Depends(require_role(["administrador"]))
 ):
-    try:
-        # Restore collections
-        for collection_name, documents in backup_file.items():
-            if collection_name == 'timestamp':
-                continue
-            collection = db[collection_name]
-            if documents:
-                await collection.delete_many({})
-                await collection.insert_many(documents)
-        
-        return {"message": "Database restored successfully"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
+    # The backup comes as a multipart upload or as the raw request body; old
+    # JSON backups are still accepted. In a multipart upload the backup_file
+    # field can be repeated: a full backup followed by its incremental ones,
+    # in order. See backup.py
+    if restore_lock.locked():
+        raise HTTPException(status_code=409, detail="A restore is already running")
+    async with restore_lock:
+        try:
+            if request.headers.get("content-type", "").startswith("multipart/form-data"):
+                # Starlette spools the uploaded files to disk while parsing
+                async with request.form() as form:
+                    uploads = form.getlist("backup_file")
+                    if not uploads or any(isinstance(upload, str) for upload in uploads):
+                        raise HTTPException(status_code=400, detail="backup_file is required")
+                    restored = await restore_backup(db, [iter_upload(upload) for upload in uploads], log=logger.info)
+            else:
+                restored = await restore_backup(db, [request.stream()], log=logger.info)
+        except HTTPException:
+            raise
+        except BackupError as e:
+            raise HTTPException(status_code=400, detail=f"Restore failed: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Restore failed: {str(e)}")
+    
+    user_cache.clear()
+    await bump_version(db, *VERSIONED_COLLECTIONS)
+    await rebuild_rollups(db)
+    await backfill_search_names(db)
+    
+    return {"message": "Database restored successfully", "collections": restored}
+
+@api_router.get("/system/stats")
+async def get_system_stats(current_user: User = Depends(require_role(["administrador"]))):
+    return {
+        "user_cache": user_cache.stats(),
+        "password_hashing": password_hasher.stats()
+    }
+
+# Read when /metrics is scraped
+metrics.callback("cache_hits_total", "Cache lookups that found the entry", "counter", ("cache",),
+                 lambda: {("user",): user_cache.hits})
+metrics.callback("cache_misses_total", "Cache lookups that missed", "counter", ("cache",),
+                 lambda: {("user",): user_cache.misses})
+metrics.callback("cache_entries", "Entries held by the cache", "gauge", ("cache",),
+                 lambda: {("user",): user_cache.stats()["size"]})
+metrics.callback("password_hash_pending", "bcrypt calls queued or running", "gauge", (),
+                 lambda: {(): password_hasher.pending})
+metrics.callback("mongodb_pool_max_size", "Maximum connections per pool", "gauge", (),
+                 lambda: {(): client.delegate.options.pool_options.max_pool_size})
+
+@api_router.get("/system/slow-queries")
+async def get_slow_queries(
+    route: Optional[str] = None,
+    collection: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: User = Depends(require_role(["administrador"]))
+):
+    # Per worker: each uvicorn process keeps its own log
+    return slow_queries.report(route, collection, limit)
+
+@api_router.delete("/system/slow-queries")
+async def clear_slow_queries(current_user: User = Depends(require_role(["administrador"]))):
+    slow_queries.clear()
+    return {"message": "Slow query log cleared"}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    if not metrics_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return Response(metrics.render(), media_type=TEXT_CONTENT_TYPE)
+
+@api_router.get("/database/indexes")
+async def get_index_status(current_user: User = Depends(require_role(["administrador"]))):
+    return await check_indexes(db)
 
 # ==================== SEED DATA ENDPOINT ====================
 
@@ -1184,36 +1497,33 @@ async def seed_database():
         admin_user = User(
             username="admin",
             email="admin@maribel.com",
-            password_hash=hash_password("admin123"),
+            password_hash=await hash_password("admin123"),
             role="administrador",
             full_name="Administrador Sistema"
         )
         admin_doc = admin_user.model_dump()
-        admin_doc['created_at'] = admin_doc['created_at'].isoformat()
         await db.users.insert_one(admin_doc)
         
         # Create vendedor user
         vendedor_user = User(
             username="vendedor",
             email="vendedor@maribel.com",
-            password_hash=hash_password("vendedor123"),
+            password_hash=await hash_password("vendedor123"),
             role="vendedor",
             full_name="Juan Pérez"
         )
         vendedor_doc = vendedor_user.model_dump()
-        vendedor_doc['created_at'] = vendedor_doc['created_at'].isoformat()
         await db.users.insert_one(vendedor_doc)
         
         # Create consulta user
         consulta_user = User(
             username="consulta",
             email="consulta@maribel.com",
-            password_hash=hash_password("consulta123"),
+            password_hash=await hash_password("consulta123"),
             role="consulta",
             full_name="María García"
         )
         consulta_doc = consulta_user.model_dump()
-        consulta_doc['created_at'] = consulta_doc['created_at'].isoformat()
         await db.users.insert_one(consulta_doc)
         
         # Create categories
@@ -1228,7 +1538,6 @@ async def seed_database():
         for cat_data in categories:
             category = Category(**cat_data)
             cat_doc = category.model_dump()
-            cat_doc['created_at'] = cat_doc['created_at'].isoformat()
             await db.categories.insert_one(cat_doc)
             category_ids.append(category.id)
         
@@ -1253,7 +1562,6 @@ async def seed_database():
         for sup_data in suppliers:
             supplier = Supplier(**sup_data)
             sup_doc = supplier.model_dump()
-            sup_doc['created_at'] = sup_doc['created_at'].isoformat()
             await db.suppliers.insert_one(sup_doc)
             supplier_ids.append(supplier.id)
         
@@ -1268,7 +1576,7 @@ async def seed_database():
                 "cost": 3.00,
                 "stock": 100,
                 "min_stock": 20,
-                "expiration_date": (datetime.now() + timedelta(days=365)).isoformat(),
+                "expiration_date": datetime.now(timezone.utc) + timedelta(days=365),
                 "barcode": "7501234567890"
             },
             {
@@ -1280,7 +1588,7 @@ async def seed_database():
                 "cost": 7.50,
                 "stock": 50,
                 "min_stock": 15,
-                "expiration_date": (datetime.now() + timedelta(days=180)).isoformat(),
+                "expiration_date": datetime.now(timezone.utc) + timedelta(days=180),
                 "barcode": "7501234567891"
             },
             {
@@ -1292,7 +1600,7 @@ async def seed_database():
                 "cost": 4.50,
                 "stock": 75,
                 "min_stock": 25,
-                "expiration_date": (datetime.now() + timedelta(days=540)).isoformat(),
+                "expiration_date": datetime.now(timezone.utc) + timedelta(days=540),
                 "barcode": "7501234567892"
             },
             {
@@ -1304,7 +1612,7 @@ async def seed_database():
                 "cost": 4.00,
                 "stock": 60,
                 "min_stock": 20,
-                "expiration_date": (datetime.now() + timedelta(days=270)).isoformat(),
+                "expiration_date": datetime.now(timezone.utc) + timedelta(days=270),
                 "barcode": "7501234567893"
             },
             {
@@ -1316,7 +1624,7 @@ async def seed_database():
                 "cost": 3.50,
                 "stock": 8,  # Low stock
                 "min_stock": 15,
-                "expiration_date": (datetime.now() + timedelta(days=90)).isoformat(),
+                "expiration_date": datetime.now(timezone.utc) + timedelta(days=90),
                 "barcode": "7501234567894"
             },
             {
@@ -1328,7 +1636,7 @@ async def seed_database():
                 "cost": 6.00,
                 "stock": 40,
                 "min_stock": 15,
-                "expiration_date": (datetime.now() + timedelta(days=450)).isoformat(),
+                "expiration_date": datetime.now(timezone.utc) + timedelta(days=450),
                 "barcode": "7501234567895"
             }
         ]
@@ -1336,9 +1644,7 @@ async def seed_database():
         for prod_data in products:
             product = Product(**prod_data)
             prod_doc = product.model_dump()
-            prod_doc['created_at'] = prod_doc['created_at'].isoformat()
-            if prod_doc['expiration_date']:
-                prod_doc['expiration_date'] = prod_doc['expiration_date']
+            prod_doc['search_name'] = search_key(prod_doc['name'])
             await db.products.insert_one(prod_doc)
             product_ids.append(product.id)
         
@@ -1367,7 +1673,6 @@ async def seed_database():
         for cust_data in customers:
             customer = Customer(**cust_data)
             cust_doc = customer.model_dump()
-            cust_doc['created_at'] = cust_doc['created_at'].isoformat()
             await db.customers.insert_one(cust_doc)
             customer_ids.append(customer.id)
         
@@ -1425,8 +1730,10 @@ async def seed_database():
         for sale_data in sales_data:
             sale = Sale(**sale_data)
             sale_doc = sale.model_dump()
-            sale_doc['created_at'] = sale_doc['created_at'].isoformat()
             await db.sales.insert_one(sale_doc)
+        await bump_version(db, *VERSIONED_COLLECTIONS)
+        # The sample sales bypass create_sale, rebuild the dashboard rollups
+        await rebuild_rollups(db)
         
         return {
             "message": "Database seeded successfully",
@@ -1450,6 +1757,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if metrics_enabled:
+    app.add_middleware(RequestMetricsMiddleware, metrics=metrics, router=app.router)
+app.add_middleware(RequestContextMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1457,6 +1768,87 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_db_indexes():
+    try:
+        report = await ensure_indexes(db, log=logger.info)
+    except Exception as e:
+        logger.error(f"Index bootstrap failed: {e}")
+        return
+    for collection_name, entry in report.items():
+        if entry["failed"] or entry["mismatched"] or entry["extra"]:
+            logger.warning(f"Index drift in {collection_name}: {entry}")
+
+@app.on_event("startup")
+async def attach_slow_query_log():
+    # explain() plans are captured on the event loop
+    slow_queries.attach(client, asyncio.get_running_loop())
+
+@app.on_event("startup")
+async def detect_transaction_support():
+    global use_transactions
+    if os.environ.get('MONGO_TRANSACTIONS', 'auto').lower() in ('false', '0', 'no'):
+        return
+    try:
+        hello = await client.admin.command("hello")
+    except Exception as e:
+        logger.warning(f"Could not detect MongoDB topology: {e}")
+        return
+    use_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+    logger.info(f"Sale transactions {'enabled' if use_transactions else 'disabled (standalone server)'}")
+
+@app.on_event("startup")
+async def migrate_text_dates():
+    # Dates written as ISO text by older versions are converted in batches in
+    # the background; the API keeps serving meanwhile
+    async def run():
+        try:
+            report = await migrate_dates(db)
+        except Exception as e:
+            logger.error(f"Date migration failed: {e}")
+            return
+        converted = {name: entry["converted"] for name, entry in report.items() if entry["converted"]}
+        if converted:
+            logger.info(f"Dates migrated to native BSON dates: {converted}")
+    asyncio.create_task(run())
+
+@app.on_event("startup")
+async def backfill_rollups():
+    # First start after upgrading: build the rollups from the existing sales
+    if await db.sales.estimated_document_count() == 0:
+        return
+    if await db.daily_sales.estimated_document_count() == 0 or await db.product_sales.estimated_document_count() == 0:
+        result = await rebuild_rollups(db)
+        logger.info(f"Sales rollups rebuilt: {result['days']} days, {result['products']} products")
+
+@app.on_event("startup")
+async def backfill_product_search_names():
+    await backfill_search_names(db)
+
+@app.on_event("startup")
+async def start_expiry_refresh():
+    global expiry_refresh_task
+    interval = float(os.environ.get('EXPIRY_BUCKETS_REFRESH_SECONDS', 3600))
+    if interval <= 0:
+        return
+    
+    # Every worker runs this loop; the lease lets one of them refresh per interval
+    owner = str(uuid.uuid4())
+    
+    async def run():
+        while True:
+            try:
+                if await acquire_refresh_lease(db, owner, interval):
+                    count = await refresh_expiry_buckets(db)
+                    logger.info(f"Expiry buckets refreshed: {count} products")
+            except Exception as e:
+                logger.error(f"Expiry buckets refresh failed: {e}")
+            await asyncio.sleep(interval)
+    expiry_refresh_task = asyncio.create_task(run())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if expiry_refresh_task is not None:
+        expiry_refresh_task.cancel()
     client.close()
+    password_hasher.shutdown()
@@ -0,0 +1,254 @@
+"""
+Registro de consultas lentas a MongoDB.
+
+Un CommandListener de pymongo anota todo comando que tarde más de
+SLOW_QUERY_MS (100 ms por defecto; 0 lo desactiva) con:
+
+- la ruta que lo originó (/api/products/{product_id}), o "-" si vino de una
+  tarea en segundo plano,
+- la forma del filtro: el filtro con los valores reemplazados por 1, así
+  {"id": "abc"} y {"id": "xyz"} cuentan como la misma consulta,
+- documentos devueltos (de la respuesta) y examinados (del explain),
+- el plan de ejecución, capturado con explain("executionStats") la primera
+  vez que aparece cada forma. explain no modifica datos, ni siquiera para
+  update o delete; los pipelines con $out o $merge solo piden el plan.
+
+Las últimas SLOW_QUERY_LOG_SIZE entradas y un resumen por forma quedan en
+memoria de cada worker y se consultan en GET /api/system/slow-queries (solo
+administradores); cada entrada también se escribe en el log.
+"""
+
+import json
+import logging
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from threading import Lock
+
+from pymongo import monitoring
+
+from metrics import command_collection
+
+logger = logging.getLogger("slowlog")
+
+# ASGI scope of the request being served; Motor copies the context into the
+# threads it runs pymongo on, so the listener sees it too
+current_request = ContextVar("current_request", default=None)
+
+# Where each command keeps its filter
+FILTER_FIELDS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+}
+EXPLAINABLE = {"find", "count", "distinct", "findAndModify", "aggregate", "update", "delete"}
+# Session and transaction fields the nested explain command must not carry
+SESSION_FIELDS = {"lsid", "txnNumber", "startTransaction", "autocommit", "writeConcern", "readConcern"}
+MAX_SHAPES = 500
+
+
+def value_shape(value):
+    if isinstance(value, dict):
+        return {key: value_shape(item) for key, item in value.items()}
+    if isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+        # $or/$and branches keep their structure, plain value lists ($in) don't
+        return [value_shape(item) for item in value]
+    return 1
+
+
+def filter_shape(command_name: str, command: dict):
+    if command_name in FILTER_FIELDS:
+        return value_shape(command.get(FILTER_FIELDS[command_name]) or {})
+    if command_name == "aggregate":
+        return [
+            {name: value_shape(spec)} if name == "$match" else name
+            for stage in command.get("pipeline", [])
+            for name, spec in stage.items()
+        ]
+    if command_name in ("update", "delete"):
+        statements = command.get("updates" if command_name == "update" else "deletes") or [{}]
+        return value_shape(statements[0].get("q") or {})
+    return None
+
+
+def returned_count(reply: dict):
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "n" in reply:
+        return reply["n"]
+    if "value" in reply:
+        return 1 if reply["value"] is not None else 0
+    if "values" in reply:
+        return len(reply["values"])
+    return None
+
+
+def find_key(document, key: str):
+    # Explain output nests the stats differently per command and version
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        items = document.values()
+    elif isinstance(document, list):
+        items = document
+    else:
+        return None
+    for item in items:
+        found = find_key(item, key)
+        if found is not None:
+            return found
+    return None
+
+
+def explain_summary(explain: dict) -> dict:
+    return {
+        "docs_examined": find_key(explain, "totalDocsExamined"),
+        "keys_examined": find_key(explain, "totalKeysExamined"),
+        "returned": find_key(explain, "nReturned"),
+        "execution_ms": find_key(explain, "executionTimeMillis"),
+        "winning_plan": find_key(explain, "winningPlan"),
+    }
+
+
+def route_name(scope) -> str:
+    if scope is None:
+        return "-"
+    # FastAPI stores the matched route in the scope before calling the handler
+    route = scope.get("route")
+    return f"{scope['method']} {getattr(route, 'path', None) or scope['path']}"
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    def __init__(self, threshold_ms: float = 100, maxsize: int = 500, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.entries = deque(maxlen=maxsize)
+        self.shapes = {}
+        self._started = {}
+        self._lock = Lock()
+        self._client = None
+        self._loop = None
+
+    def attach(self, client, loop):
+        """Enable explain capture; the listener is created before the client."""
+        self._client = client
+        self._loop = loop
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def started(self, event):
+        if self.enabled:
+            self._started[(event.connection_id, event.request_id)] = (event.command, event.database_name)
+
+    def succeeded(self, event):
+        self._finish(event, event.reply, None)
+
+    def failed(self, event):
+        self._finish(event, {}, event.failure.get("errmsg") if isinstance(event.failure, dict) else str(event.failure))
+
+    def _finish(self, event, reply: dict, error):
+        started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None or event.duration_micros < self.threshold_ms * 1000:
+            return
+        command, database = started
+        collection = command_collection(event.command_name, command)
+        if collection == "-":
+            return
+        shape = filter_shape(event.command_name, command)
+        key = f"{collection}.{event.command_name} {json.dumps(shape, sort_keys=True, default=str)}"
+        duration_ms = round(event.duration_micros / 1000, 2)
+        entry = {
+            "at": datetime.now(timezone.utc),
+            "key": key,
+            "route": route_name(current_request.get()),
+            "collection": collection,
+            "command": event.command_name,
+            "shape": shape,
+            "duration_ms": duration_ms,
+            "returned": returned_count(reply),
+            "error": error,
+        }
+        logger.warning(f"Slow {collection}.{event.command_name} {duration_ms} ms from {entry['route']}: {key}")
+
+        # Driver threads append while a request may be reading the report
+        with self._lock:
+            self.entries.append(entry)
+            summary = self.shapes.get(key)
+            if summary is None:
+                if len(self.shapes) >= MAX_SHAPES:
+                    return
+                summary = self.shapes[key] = {
+                    "key": key, "collection": collection, "command": event.command_name, "shape": shape,
+                    "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                    "first_route": entry["route"], "first_seen": entry["at"], "last_seen": None, "explain": None,
+                }
+                first = True
+            else:
+                first = False
+            summary["count"] += 1
+            summary["total_ms"] += duration_ms
+            summary["max_ms"] = max(summary["max_ms"], duration_ms)
+            summary["last_seen"] = entry["at"]
+        if first and self.explain and self._loop is not None and event.command_name in EXPLAINABLE:
+            self._loop.call_soon_threadsafe(self._schedule_explain, summary, database, command)
+
+    def _schedule_explain(self, summary: dict, database: str, command: dict):
+        self._loop.create_task(self._capture_explain(summary, database, command))
+
+    async def _capture_explain(self, summary: dict, database: str, command: dict):
+        nested = {name: value for name, value in command.items() if not name.startswith("$") and name not in SESSION_FIELDS}
+        writes = any("$out" in stage or "$merge" in stage for stage in nested.get("pipeline", []))
+        try:
+            explain = await self._client[database].command(
+                {"explain": nested, "verbosity": "queryPlanner" if writes else "executionStats"}
+            )
+        except Exception as e:
+            summary["explain"] = {"error": str(e)}
+            return
+        summary["explain"] = explain_summary(explain)
+
+    def report(self, route: str = None, collection: str = None, limit: int = 100) -> dict:
+        with self._lock:
+            entries = list(self.entries)
+            shapes = sorted(
+                (dict(summary, avg_ms=round(summary["total_ms"] / summary["count"], 2)) for summary in self.shapes.values()
+                 if collection is None or summary["collection"] == collection),
+                key=lambda summary: summary["total_ms"], reverse=True,
+            )
+        entries = [
+            entry for entry in reversed(entries)
+            if (route is None or route in entry["route"]) and (collection is None or entry["collection"] == collection)
+        ][:limit]
+        # Examined documents come from the explain of the shape
+        examined = {summary["key"]: (summary["explain"] or {}).get("docs_examined") for summary in shapes}
+        return {
+            "threshold_ms": self.threshold_ms,
+            "entries": [dict(entry, examined=examined.get(entry["key"])) for entry in entries],
+            "shapes": shapes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.shapes.clear()
+
+
+class RequestContextMiddleware:
+    """Make the ASGI scope of the current request visible to the slow query log."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_request.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
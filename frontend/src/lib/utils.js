@@ -1,6 +1,26 @@
+import axios from "axios";
 import { clsx } from "clsx";
 import { twMerge } from "tailwind-merge"
 
+// Mayor limit que aceptan los listados de la API (MAX_PAGE_SIZE)
+const MAX_PAGE_SIZE = 1000;
+
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// Los listados de la API devuelven páginas ({ items, next_cursor }); trae
+// todas siguiendo next_cursor, para las pantallas que necesitan la lista completa
+export async function fetchAllPages(url, config = {}) {
+  const items = [];
+  let after = null;
+  do {
+    const response = await axios.get(url, {
+      ...config,
+      params: { ...config.params, limit: MAX_PAGE_SIZE, ...(after ? { after } : {}) }
+    });
+    items.push(...response.data.items);
+    after = response.data.next_cursor;
+  } while (after);
+  return items;
+}
@@ -3,6 +3,7 @@ import Layout from '../components/Layout';
 import DeleteConfirmModal from '../components/DeleteConfirmModal';
 import axios from 'axios';
 import { AuthContext } from '../App';
+import { fetchAllPages } from '../lib/utils';
 import { Plus, Edit, Trash2, Eye, X } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -29,10 +30,10 @@ const Categories = () => {
 
   const fetchCategories = async () => {
     try {
-      const response = await axios.get(`${API}/categories`, {
+      const categories = await fetchAllPages(`${API}/categories`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setCategories(response.data);
+      setCategories(categories);
     } catch (error) {
       console.error('Error fetching categories:', error);
     }
@@ -75,10 +76,10 @@ const Categories = () => {
 
   const openDeleteModal = async (category) => {
     try {
-      const productsResponse = await axios.get(`${API}/products`, {
+      const products = await fetchAllPages(`${API}/products`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      const productsInCategory = productsResponse.data.filter(p => p.category_id === category.id);
+      const productsInCategory = products.filter(p => p.category_id === category.id);
       setDeleteModal({ isOpen: true, category, productsCount: productsInCategory.length });
     } catch (error) {
       console.error('Error checking products:', error);
@@ -116,10 +117,10 @@ const Categories = () => {
 
   const handleViewProducts = async (category) => {
     try {
-      const response = await axios.get(`${API}/products`, {
+      const products = await fetchAllPages(`${API}/products`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      const filtered = response.data.filter(p => p.category_id === category.id);
+      const filtered = products.filter(p => p.category_id === category.id);
       setSelectedCategory(category);
       setCategoryProducts(filtered);
       setShowProductsModal(true);
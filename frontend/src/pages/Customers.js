@@ -3,6 +3,7 @@ import Layout from '../components/Layout';
 import DeleteConfirmModal from '../components/DeleteConfirmModal';
 import axios from 'axios';
 import { AuthContext } from '../App';
+import { fetchAllPages } from '../lib/utils';
 import { Plus, Edit, Trash2, Mail, Phone, MapPin } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -28,10 +29,10 @@ const Customers = () => {
 
   const fetchCustomers = async () => {
     try {
-      const response = await axios.get(`${API}/customers`, {
+      const customers = await fetchAllPages(`${API}/customers`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setCustomers(response.data);
+      setCustomers(customers);
     } catch (error) {
       console.error('Error fetching customers:', error);
     }
@@ -80,10 +81,10 @@ const Customers = () => {
 
   const openDeleteModal = async (customer) => {
     try {
-      const salesResponse = await axios.get(`${API}/sales`, {
+      const sales = await fetchAllPages(`${API}/sales`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      const customerSales = salesResponse.data.filter(s => s.customer_id === customer.id);
+      const customerSales = sales.filter(s => s.customer_id === customer.id);
       setDeleteModal({ isOpen: true, customer, salesCount: customerSales.length });
     } catch (error) {
       console.error('Error checking sales:', error);
@@ -2,6 +2,7 @@ import React, { useState, useEffect, useContext } from 'react';
 import Layout from '../components/Layout';
 import axios from 'axios';
 import { AuthContext } from '../App';
+import { fetchAllPages } from '../lib/utils';
 import { BarChart, Bar, LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 import { DollarSign, Package, Users, AlertTriangle, X, Eye } from 'lucide-react';
 
@@ -63,43 +64,43 @@ const Dashboard = () => {
       switch(type) {
         case 'sales-today':
           const today = new Date().toISOString().split('T')[0];
-          const salesRes = await axios.get(`${API}/sales`, {
-            headers: { Authorization: `Bearer ${token}` }
+          // Solo las ventas del rango, no todo el historial
+          data = await fetchAllPages(`${API}/reports/sales-report`, {
+            headers: { Authorization: `Bearer ${token}` },
+            params: { start_date: today, end_date: today }
           });
-          data = salesRes.data.filter(sale => sale.created_at.startsWith(today));
           title = 'Ventas de Hoy';
           break;
           
         case 'low-stock':
-          const productsRes = await axios.get(`${API}/products`, {
+          const lowStockProducts = await fetchAllPages(`${API}/products`, {
             headers: { Authorization: `Bearer ${token}` }
           });
-          data = productsRes.data.filter(p => p.stock <= p.min_stock && p.active);
+          data = lowStockProducts.filter(p => p.stock <= p.min_stock && p.active);
           title = 'Productos con Stock Bajo';
           break;
           
         case 'products':
-          const allProductsRes = await axios.get(`${API}/products`, {
+          const allProducts = await fetchAllPages(`${API}/products`, {
             headers: { Authorization: `Bearer ${token}` }
           });
-          data = allProductsRes.data.filter(p => p.active);
+          data = allProducts.filter(p => p.active);
           title = 'Productos Activos';
           break;
           
         case 'customers':
-          const customersRes = await axios.get(`${API}/customers`, {
+          data = await fetchAllPages(`${API}/customers`, {
             headers: { Authorization: `Bearer ${token}` }
           });
-          data = customersRes.data;
           title = 'Clientes Registrados';
           break;
           
         case 'sales-month':
           const firstDay = new Date(new Date().getFullYear(), new Date().getMonth(), 1).toISOString().split('T')[0];
-          const monthSalesRes = await axios.get(`${API}/sales`, {
-            headers: { Authorization: `Bearer ${token}` }
+          data = await fetchAllPages(`${API}/reports/sales-report`, {
+            headers: { Authorization: `Bearer ${token}` },
+            params: { start_date: firstDay, end_date: new Date().toISOString().split('T')[0] }
           });
-          data = monthSalesRes.data.filter(sale => sale.created_at >= firstDay);
           title = 'Ventas del Mes';
           break;
       }
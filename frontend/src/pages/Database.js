@@ -10,21 +10,23 @@ const API = `${BACKEND_URL}/api`;
 const Database = () => {
   const { token } = useContext(AuthContext);
   const [loading, setLoading] = useState(false);
-  const [restoreFile, setRestoreFile] = useState(null);
+  const [restoreFiles, setRestoreFiles] = useState([]);
 
-  const handleBackup = async () => {
+  const handleBackup = async (incremental = false) => {
     setLoading(true);
     try {
       const response = await axios.get(`${API}/database/backup`, {
         headers: { Authorization: `Bearer ${token}` },
+        params: { incremental },
         responseType: 'blob'
       });
 
-      const blob = new Blob([response.data], { type: 'application/json' });
+      const blob = new Blob([response.data], { type: 'application/gzip' });
       const url = window.URL.createObjectURL(blob);
       const link = document.createElement('a');
       link.href = url;
-      const filename = `backup_${new Date().toISOString().split('T')[0]}.json`;
+      const suffix = incremental ? '_incremental' : '';
+      const filename = `backup_${new Date().toISOString().replace(/[-:]/g, '').replace('T', '_').split('.')[0]}${suffix}.ndjson.gz`;
       link.setAttribute('download', filename);
       document.body.appendChild(link);
       link.click();
@@ -41,14 +43,14 @@ const Database = () => {
   };
 
   const handleFileChange = (e) => {
-    const file = e.target.files[0];
-    if (file) {
-      setRestoreFile(file);
-    }
+    // A full backup plus its incremental ones; the names carry the date, so
+    // sorting them by name puts them in the order they were taken
+    const files = Array.from(e.target.files).sort((a, b) => a.name.localeCompare(b.name));
+    setRestoreFiles(files);
   };
 
   const handleRestore = async () => {
-    if (!restoreFile) {
+    if (restoreFiles.length === 0) {
       alert('Por favor seleccione un archivo de respaldo');
       return;
     }
@@ -59,33 +61,21 @@ const Database = () => {
 
     setLoading(true);
     try {
-      const reader = new FileReader();
-      reader.onload = async (e) => {
-        try {
-          const backupData = JSON.parse(e.target.result);
-          await axios.post(`${API}/database/restore`, backupData, {
-            headers: { Authorization: `Bearer ${token}` }
-          });
-          alert('Base de datos restaurada exitosamente. Por favor, recargue la página.');
-          setRestoreFile(null);
-          // Recargar la página después de 2 segundos
-          setTimeout(() => window.location.reload(), 2000);
-        } catch (error) {
-          console.error('Error restoring database:', error);
-          const errorMessage = error.response?.data?.detail || error.message || 'Error desconocido';
-          alert('Error al restaurar la base de datos: ' + errorMessage);
-        } finally {
-          setLoading(false);
-        }
-      };
-      reader.onerror = () => {
-        alert('Error al leer el archivo');
-        setLoading(false);
-      };
-      reader.readAsText(restoreFile);
+      // The file is uploaded as is; the server reads it in chunks
+      const formData = new FormData();
+      restoreFiles.forEach((file) => formData.append('backup_file', file));
+      await axios.post(`${API}/database/restore`, formData, {
+        headers: { Authorization: `Bearer ${token}` }
+      });
+      alert('Base de datos restaurada exitosamente. Por favor, recargue la página.');
+      setRestoreFiles([]);
+      // Recargar la página después de 2 segundos
+      setTimeout(() => window.location.reload(), 2000);
     } catch (error) {
-      console.error('Error reading file:', error);
-      alert('Error al leer el archivo: ' + error.message);
+      console.error('Error restoring database:', error);
+      const errorMessage = error.response?.data?.detail || error.message || 'Error desconocido';
+      alert('Error al restaurar la base de datos: ' + errorMessage);
+    } finally {
       setLoading(false);
     }
   };
@@ -124,7 +114,7 @@ const Database = () => {
               </div>
 
               <button
-                onClick={handleBackup}
+                onClick={() => handleBackup(false)}
                 disabled={loading}
                 className="w-full flex items-center justify-center space-x-2 bg-blue-600 text-white px-4 py-3 rounded-lg hover:bg-blue-700 disabled:opacity-50 disabled:cursor-not-allowed"
                 data-testid="backup-button"
@@ -132,6 +122,19 @@ const Database = () => {
                 <Download size={20} />
                 <span>{loading ? 'Creando respaldo...' : 'Crear Respaldo'}</span>
               </button>
+
+              <button
+                onClick={() => handleBackup(true)}
+                disabled={loading}
+                className="w-full flex items-center justify-center space-x-2 border border-blue-600 text-blue-600 px-4 py-3 rounded-lg hover:bg-blue-50 disabled:opacity-50 disabled:cursor-not-allowed"
+                data-testid="incremental-backup-button"
+              >
+                <Download size={20} />
+                <span>Crear Respaldo Incremental</span>
+              </button>
+              <p className="text-xs text-gray-500">
+                El respaldo incremental solo incluye los cambios desde el último respaldo.
+              </p>
             </div>
           </div>
 
@@ -162,25 +165,29 @@ const Database = () => {
 
               <div>
                 <label className="block text-sm font-medium text-gray-700 mb-2">
-                  Seleccionar archivo de respaldo
+                  Seleccionar archivos de respaldo
                 </label>
                 <input
                   type="file"
-                  accept=".json"
+                  multiple
+                  accept=".gz,.ndjson,.json"
                   onChange={handleFileChange}
                   className="w-full px-3 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-emerald-500"
                   data-testid="restore-file-input"
                 />
-                {restoreFile && (
+                {restoreFiles.length > 0 && (
                   <p className="text-sm text-gray-600 mt-2">
-                    Archivo seleccionado: {restoreFile.name}
+                    Archivos seleccionados: {restoreFiles.map((file) => file.name).join(', ')}
                   </p>
                 )}
+                <p className="text-xs text-gray-500 mt-1">
+                  Seleccione el respaldo completo junto con sus respaldos incrementales.
+                </p>
               </div>
 
               <button
                 onClick={handleRestore}
-                disabled={loading || !restoreFile}
+                disabled={loading || restoreFiles.length === 0}
                 className="w-full flex items-center justify-center space-x-2 bg-emerald-600 text-white px-4 py-3 rounded-lg hover:bg-emerald-700 disabled:opacity-50 disabled:cursor-not-allowed"
                 data-testid="restore-button"
               >
@@ -2,6 +2,7 @@ import React, { useState, useEffect, useContext } from 'react';
 import Layout from '../components/Layout';
 import axios from 'axios';
 import { AuthContext } from '../App';
+import { fetchAllPages } from '../lib/utils';
 import { Plus } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -26,10 +27,10 @@ const InventoryMovements = () => {
 
   const fetchMovements = async () => {
     try {
-      const response = await axios.get(`${API}/inventory-movements`, {
+      const movements = await fetchAllPages(`${API}/inventory-movements`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setMovements(response.data);
+      setMovements(movements);
     } catch (error) {
       console.error('Error fetching movements:', error);
     }
@@ -37,10 +38,10 @@ const InventoryMovements = () => {
 
   const fetchProducts = async () => {
     try {
-      const response = await axios.get(`${API}/products`, {
+      const products = await fetchAllPages(`${API}/products`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setProducts(response.data);
+      setProducts(products);
     } catch (error) {
       console.error('Error fetching products:', error);
     }
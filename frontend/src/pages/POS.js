@@ -3,6 +3,7 @@ import Layout from '../components/Layout';
 import Receipt from '../components/Receipt';
 import axios from 'axios';
 import { AuthContext } from '../App';
+import { fetchAllPages } from '../lib/utils';
 import { Plus, Minus, Trash2, Search, ShoppingCart } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -22,16 +23,22 @@ const POS = () => {
   const [lastSale, setLastSale] = useState(null);
 
   useEffect(() => {
-    fetchProducts();
     fetchCustomers();
   }, []);
 
-  const fetchProducts = async () => {
+  // La búsqueda se resuelve en el servidor; se espera a que el usuario deje de escribir
+  useEffect(() => {
+    const timer = setTimeout(() => fetchProducts(searchTerm), 250);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  const fetchProducts = async (term = searchTerm) => {
     try {
-      const response = await axios.get(`${API}/products`, {
-        headers: { Authorization: `Bearer ${token}` }
+      const response = await axios.get(`${API}/products/search`, {
+        headers: { Authorization: `Bearer ${token}` },
+        params: { q: term, in_stock: true, limit: 12 }
       });
-      setProducts(response.data.filter(p => p.active && p.stock > 0));
+      setProducts(response.data);
     } catch (error) {
       console.error('Error fetching products:', error);
     }
@@ -39,10 +46,10 @@ const POS = () => {
 
   const fetchCustomers = async () => {
     try {
-      const response = await axios.get(`${API}/customers`, {
+      const customers = await fetchAllPages(`${API}/customers`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setCustomers(response.data);
+      setCustomers(customers);
     } catch (error) {
       console.error('Error fetching customers:', error);
     }
@@ -66,16 +73,17 @@ const POS = () => {
         product_name: product.name,
         quantity: 1,
         unit_price: product.price,
-        subtotal: product.price
+        subtotal: product.price,
+        stock: product.stock
       }]);
     }
   };
 
   const updateQuantity = (productId, newQuantity) => {
-    const product = products.find(p => p.id === productId);
+    const item = cart.find(i => i.product_id === productId);
     if (newQuantity <= 0) {
       setCart(cart.filter(item => item.product_id !== productId));
-    } else if (newQuantity <= product.stock) {
+    } else if (newQuantity <= item.stock) {
       setCart(cart.map(item =>
         item.product_id === productId
           ? { ...item, quantity: newQuantity, subtotal: newQuantity * item.unit_price }
@@ -111,7 +119,7 @@ const POS = () => {
       const saleData = {
         customer_id: selectedCustomer?.id || null,
         customer_name: selectedCustomer?.name || 'Cliente General',
-        details: cart,
+        details: cart.map(({ stock, ...detail }) => detail),
         tax: parseFloat(tax || 0),
         discount: parseFloat(discount || 0),
         payment_method: paymentMethod
@@ -137,11 +145,6 @@ const POS = () => {
     }
   };
 
-  const filteredProducts = products.filter(product =>
-    product.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    (product.barcode && product.barcode.includes(searchTerm))
-  );
-
   return (
     <Layout>
       <div className="space-y-6" data-testid="pos-page">
@@ -167,7 +170,7 @@ const POS = () => {
 
             {/* Products Grid */}
             <div className="grid grid-cols-1 sm:grid-cols-2 gap-4">
-              {filteredProducts.slice(0, 12).map((product) => (
+              {products.map((product) => (
                 <div
                   key={product.id}
                   onClick={() => addToCart(product)}
@@ -3,6 +3,7 @@ import Layout from '../components/Layout';
 import DeleteConfirmModal from '../components/DeleteConfirmModal';
 import axios from 'axios';
 import { AuthContext } from '../App';
+import { fetchAllPages } from '../lib/utils';
 import { Plus, Edit, Trash2, Search } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -39,10 +40,10 @@ const Products = () => {
 
   const fetchProducts = async () => {
     try {
-      const response = await axios.get(`${API}/products`, {
+      const products = await fetchAllPages(`${API}/products`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setProducts(response.data);
+      setProducts(products);
     } catch (error) {
       console.error('Error fetching products:', error);
     }
@@ -50,10 +51,10 @@ const Products = () => {
 
   const fetchCategories = async () => {
     try {
-      const response = await axios.get(`${API}/categories`, {
+      const categories = await fetchAllPages(`${API}/categories`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setCategories(response.data);
+      setCategories(categories);
     } catch (error) {
       console.error('Error fetching categories:', error);
     }
@@ -61,10 +62,10 @@ const Products = () => {
 
   const fetchSuppliers = async () => {
     try {
-      const response = await axios.get(`${API}/suppliers`, {
+      const suppliers = await fetchAllPages(`${API}/suppliers`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setSuppliers(response.data);
+      setSuppliers(suppliers);
     } catch (error) {
       console.error('Error fetching suppliers:', error);
     }
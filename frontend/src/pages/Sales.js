@@ -10,6 +10,8 @@ const API = `${BACKEND_URL}/api`;
 const Sales = () => {
   const { token } = useContext(AuthContext);
   const [sales, setSales] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedSale, setSelectedSale] = useState(null);
   const [showModal, setShowModal] = useState(false);
 
@@ -17,14 +19,20 @@ const Sales = () => {
     fetchSales();
   }, []);
 
-  const fetchSales = async () => {
+  // Las ventas llegan por páginas, de la más reciente a la más antigua
+  const fetchSales = async (after = null) => {
+    setLoadingMore(true);
     try {
       const response = await axios.get(`${API}/sales`, {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}` },
+        params: after ? { after } : {}
       });
-      setSales(response.data);
+      setSales(previous => after ? [...previous, ...response.data.items] : response.data.items);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Error fetching sales:', error);
+    } finally {
+      setLoadingMore(false);
     }
   };
 
@@ -99,6 +107,18 @@ const Sales = () => {
               </tbody>
             </table>
           </div>
+          {nextCursor && (
+            <div className="flex justify-center p-4 border-t border-gray-200">
+              <button
+                onClick={() => fetchSales(nextCursor)}
+                disabled={loadingMore}
+                className="px-4 py-2 bg-emerald-600 text-white rounded-lg hover:bg-emerald-700 disabled:opacity-50 disabled:cursor-not-allowed"
+                data-testid="load-more-sales"
+              >
+                {loadingMore ? 'Cargando...' : 'Cargar más ventas'}
+              </button>
+            </div>
+          )}
         </div>
 
         {/* Modal */}
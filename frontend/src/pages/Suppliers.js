@@ -3,6 +3,7 @@ import Layout from '../components/Layout';
 import DeleteConfirmModal from '../components/DeleteConfirmModal';
 import axios from 'axios';
 import { AuthContext } from '../App';
+import { fetchAllPages } from '../lib/utils';
 import { Plus, Edit, Trash2, Mail, Phone, MapPin } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -29,10 +30,10 @@ const Suppliers = () => {
 
   const fetchSuppliers = async () => {
     try {
-      const response = await axios.get(`${API}/suppliers`, {
+      const suppliers = await fetchAllPages(`${API}/suppliers`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setSuppliers(response.data);
+      setSuppliers(suppliers);
     } catch (error) {
       console.error('Error fetching suppliers:', error);
     }
@@ -78,10 +79,10 @@ const Suppliers = () => {
 
   const openDeleteModal = async (supplier) => {
     try {
-      const productsResponse = await axios.get(`${API}/products`, {
+      const products = await fetchAllPages(`${API}/products`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      const productsFromSupplier = productsResponse.data.filter(p => p.supplier_id === supplier.id);
+      const productsFromSupplier = products.filter(p => p.supplier_id === supplier.id);
       setDeleteModal({ isOpen: true, supplier, productsCount: productsFromSupplier.length });
     } catch (error) {
       console.error('Error checking products:', error);
@@ -3,6 +3,7 @@ import Layout from '../components/Layout';
 import DeleteConfirmModal from '../components/DeleteConfirmModal';
 import axios from 'axios';
 import { AuthContext } from '../App';
+import { fetchAllPages } from '../lib/utils';
 import { Plus, Edit, Trash2 } from 'lucide-react';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
@@ -29,10 +30,10 @@ const Users = () => {
 
   const fetchUsers = async () => {
     try {
-      const response = await axios.get(`${API}/users`, {
+      const users = await fetchAllPages(`${API}/users`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setUsers(response.data);
+      setUsers(users);
     } catch (error) {
       console.error('Error fetching users:', error);
     }
@@ -92,10 +93,10 @@ const Users = () => {
         return;
       }
       
-      const salesResponse = await axios.get(`${API}/sales`, {
+      const sales = await fetchAllPages(`${API}/sales`, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      const userSales = salesResponse.data.filter(s => s.user_id === user.id);
+      const userSales = sales.filter(s => s.user_id === user.id);
       setDeleteModal({ isOpen: true, user, salesCount: userSales.length });
     } catch (error) {
       console.error('Error checking data:', error);
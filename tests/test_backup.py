@@ -0,0 +1,262 @@
+import gzip
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import DeleteOne, ReplaceOne
+
+from backup import (
+    STAGING_PREFIX,
+    BackupError,
+    decode_line,
+    encode_line,
+    find_backup_base,
+    iter_backup,
+    iter_backup_records,
+    load_backup,
+)
+
+CREATED_AT = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, *args):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield dict(document)
+
+
+def matches(document: dict, query: dict) -> bool:
+    # Only plain equality; operators ($gt...) are ignored and match everything
+    return all(document.get(key) == value for key, value in query.items()
+               if not key.startswith("$") and not isinstance(value, dict))
+
+
+class FakeCollection:
+    def __init__(self, documents=None):
+        self.documents = list(documents or [])
+        self.bulk_operations = []
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([document for document in self.documents if matches(document, query or {})])
+
+    async def find_one(self, query=None, projection=None, sort=None):
+        found = [document for document in self.documents if matches(document, query or {})]
+        found.sort(key=lambda document: document["created_at"], reverse=True)
+        return dict(found[0]) if found else None
+
+    async def insert_one(self, document):
+        self.documents.append(document)
+
+    async def insert_many(self, documents, ordered=True):
+        self.documents.extend(documents)
+
+    async def bulk_write(self, operations, ordered=True):
+        self.bulk_operations.extend(operations)
+
+
+class FakeDB:
+    def __init__(self, **collections):
+        self.collections = {name: FakeCollection(documents) for name, documents in collections.items()}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+def sample_db(**extra) -> FakeDB:
+    return FakeDB(
+        users=[
+            {"id": "u1", "username": "admin", "created_at": CREATED_AT},
+            {"id": "u2", "username": "vendedor", "created_at": CREATED_AT},
+        ],
+        products=[{"id": "p1", "name": "Paracetamol", "stock": 10, "created_at": CREATED_AT}],
+        **extra,
+    )
+
+
+async def make_backup(db, base=None, collections=("users", "products")) -> bytes:
+    return b"".join([chunk async for chunk in iter_backup(db, list(collections), base)])
+
+
+async def chunked(data: bytes, size: int = 7):
+    # Small chunks so lines and gzip blocks are split across reads
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def rewrite(data: bytes, change) -> bytes:
+    """Decompress a backup, let change edit its list of records and compress it again."""
+    records = [decode_line(line) for line in gzip.decompress(data).splitlines()]
+    change(records)
+    return gzip.compress(b"".join(encode_line(record) for record in records))
+
+
+async def read_records(data: bytes) -> list:
+    return [record async for _, record in iter_backup_records(chunked(data))]
+
+
+@pytest.mark.anyio
+async def test_backup_round_trip():
+    source = sample_db()
+    data = await make_backup(source)
+
+    records = await read_records(data)
+    assert records[0]["type"] == "header" and records[0]["kind"] == "full"
+    assert records[-1]["type"] == "manifest"
+    documents = [record for record in records if record["type"] == "document"]
+    assert [(record["collection"], record["data"]) for record in documents] == \
+        [("users", user) for user in source.users.documents] + [("products", source.products.documents[0])]
+    assert documents[0]["data"]["created_at"] == CREATED_AT
+
+    target = FakeDB()
+    header, totals = await load_backup(target, chunked(data))
+    assert header["id"] == records[0]["id"]
+    assert {name: entry["count"] for name, entry in totals.items()} == {"users": 2, "products": 1}
+    assert target[STAGING_PREFIX + "users"].documents == source.users.documents
+    # The finished backup is recorded for incrementals to build on
+    assert source.backups.documents[0]["id"] == header["id"]
+
+
+@pytest.mark.anyio
+async def test_truncated_gzip_is_rejected():
+    data = await make_backup(sample_db())
+    with pytest.raises(BackupError, match="Truncated"):
+        await load_backup(FakeDB(), chunked(data[:-12]))
+
+
+@pytest.mark.anyio
+async def test_manifest_count_mismatch_is_rejected():
+    def change(records):
+        records[-1]["collections"]["users"]["count"] = 3
+
+    data = rewrite(await make_backup(sample_db()), change)
+    with pytest.raises(BackupError, match="users: document count"):
+        await load_backup(FakeDB(), chunked(data))
+
+
+@pytest.mark.anyio
+async def test_manifest_checksum_mismatch_is_rejected():
+    def change(records):
+        records[1]["data"]["username"] = "intruso"
+
+    data = rewrite(await make_backup(sample_db()), change)
+    with pytest.raises(BackupError, match="users: checksum"):
+        await load_backup(FakeDB(), chunked(data))
+
+
+@pytest.mark.anyio
+async def test_missing_manifest_is_rejected():
+    data = rewrite(await make_backup(sample_db()), lambda records: records.pop())
+    with pytest.raises(BackupError, match="no manifest"):
+        await load_backup(FakeDB(), chunked(data))
+
+
+@pytest.mark.anyio
+async def test_documents_after_manifest_are_rejected():
+    def change(records):
+        records.append({"type": "document", "collection": "users", "data": {"id": "u3"}})
+
+    data = rewrite(await make_backup(sample_db()), change)
+    with pytest.raises(BackupError, match="after the manifest"):
+        await load_backup(FakeDB(), chunked(data))
+
+
+@pytest.mark.anyio
+async def test_unknown_collection_is_rejected():
+    def change(records):
+        records.insert(1, {"type": "document", "collection": "system.users", "data": {"id": "x"}})
+
+    data = rewrite(await make_backup(sample_db()), change)
+    with pytest.raises(BackupError, match="Unknown collection"):
+        await load_backup(FakeDB(), chunked(data))
+
+
+async def backup_chain(db) -> list:
+    """A full backup and two incrementals on top of it, as (header, data) pairs."""
+    chain = []
+    base = None
+    for _ in range(3):
+        data = await make_backup(db, base)
+        chain.append(((await read_records(data))[0], data))
+        base = db.backups.documents[-1]
+    return chain
+
+
+@pytest.mark.anyio
+async def test_incrementals_must_follow_their_base():
+    (full, _), (first, first_data), (_, second_data) = await backup_chain(sample_db())
+    assert first["kind"] == "incremental" and first["parent_id"] == full["id"]
+
+    with pytest.raises(BackupError, match="in order"):
+        await load_backup(FakeDB(), chunked(second_data), parent=full)
+    with pytest.raises(BackupError, match="first file must be a full backup"):
+        await load_backup(FakeDB(), chunked(first_data))
+    header, _ = await load_backup(FakeDB(), chunked(first_data), parent=full)
+    assert header["id"] == first["id"]
+
+
+@pytest.mark.anyio
+async def test_incremental_base_must_exist_and_be_recent():
+    with pytest.raises(BackupError, match="No previous backup"):
+        await find_backup_base(FakeDB())
+
+    old = datetime.now(timezone.utc) - timedelta(days=100)
+    with pytest.raises(BackupError, match="too old"):
+        await find_backup_base(FakeDB(backups=[{"id": "b1", "kind": "full", "created_at": old}]))
+
+    recent = datetime.now(timezone.utc) - timedelta(days=1)
+    base = await find_backup_base(FakeDB(backups=[{"id": "b1", "kind": "full", "created_at": old},
+                                                  {"id": "b2", "kind": "full", "created_at": recent}]))
+    assert base["id"] == "b2"
+
+
+@pytest.mark.anyio
+async def test_deletions_are_rejected_in_full_backups():
+    def change(records):
+        records.insert(-1, {"type": "deletion", "collection": "users", "id": "u2"})
+
+    data = rewrite(await make_backup(sample_db()), change)
+    with pytest.raises(BackupError, match="only valid in incremental"):
+        await load_backup(FakeDB(), chunked(data))
+
+
+@pytest.mark.anyio
+async def test_incremental_builds_replace_and_delete_batches():
+    source = sample_db()
+    full_data = await make_backup(source)
+    full = (await read_records(full_data))[0]
+    source.users.documents = [{"id": "u1", "username": "administrador", "created_at": CREATED_AT,
+                               "updated_at": CREATED_AT + timedelta(days=1)}]
+    source.deletions.documents.append({"collection": "users", "id": "u2", "deleted_at": CREATED_AT})
+    data = await make_backup(source, source.backups.documents[-1])
+
+    target = FakeDB()
+    _, totals = await load_backup(target, chunked(data), parent=full)
+    assert totals["users"]["count"] == 1 and totals["users"]["deleted"] == 1
+    assert target[STAGING_PREFIX + "users"].bulk_operations == [
+        ReplaceOne({"id": "u1"}, source.users.documents[0], upsert=True),
+        DeleteOne({"id": "u2"}),
+    ]
+    assert target[STAGING_PREFIX + "products"].bulk_operations == [
+        ReplaceOne({"id": "p1"}, source.products.documents[0], upsert=True),
+    ]
+
+
+@pytest.mark.anyio
+async def test_invalid_legacy_date_is_rejected():
+    legacy = b'{"users": [{"id": "u1", "created_at": "31/12/2023"}], "timestamp": "2024-01-01"}'
+    with pytest.raises(BackupError, match="Invalid date in users"):
+        await load_backup(FakeDB(), chunked(legacy))
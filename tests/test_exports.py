@@ -0,0 +1,27 @@
+import pytest
+
+from exports import iter_csv
+
+COLUMNS = {'Nombre': 'string', 'Stock': 'int'}
+
+
+async def rows_of(*rows):
+    for row in rows:
+        yield row
+
+
+async def read_csv(rows) -> bytes:
+    return b"".join([chunk async for chunk in iter_csv(rows, COLUMNS)])
+
+
+@pytest.mark.anyio
+async def test_csv_starts_with_bom_and_keeps_accents():
+    body = await read_csv(rows_of({'Nombre': 'Ácido fólico', 'Stock': 3}))
+    assert body.startswith(b"\xef\xbb\xbf")
+    assert body.decode("utf-8-sig").splitlines() == ["Nombre,Stock", "Ácido fólico,3"]
+
+
+@pytest.mark.anyio
+async def test_empty_csv_still_has_the_header_row():
+    body = await read_csv(rows_of())
+    assert body.decode("utf-8-sig").splitlines() == ["Nombre,Stock"]
@@ -0,0 +1,46 @@
+import os
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+
+
+@pytest.fixture
+async def seeded_db(mongo_available, monkeypatch):
+    import server
+
+    # A client of its own: server.client is shared with the rest of the session
+    client = AsyncIOMotorClient(os.environ["MONGO_URL"])
+    db = client[os.environ["DB_NAME"]]
+    monkeypatch.setattr(server, "db", db)
+    await client.drop_database(db.name)
+    await server.seed_database()
+    yield server
+    await client.drop_database(db.name)
+    client.close()
+
+
+async def raw_quantities(db, match=None) -> dict:
+    pipeline = [
+        {"$match": match or {}},
+        {"$unwind": "$details"},
+        {"$group": {"_id": "$details.product_id", "quantity": {"$sum": "$details.quantity"}}},
+    ]
+    return {row["_id"]: row["quantity"] async for row in db.sales.aggregate(pipeline)}
+
+
+@pytest.mark.anyio
+async def test_top_selling_after_seed_matches_raw_sales(seeded_db):
+    server = seeded_db
+    expected = await raw_quantities(server.db)
+    assert expected
+
+    all_time = await server.top_selling_products(100)
+    assert {row["product_id"]: row["quantity"] for row in all_time} == expected
+
+    # The seed sales are dated now, so the current month ranks the same
+    month = await server.top_selling_products(100, period="month")
+    assert {row["product_id"]: row["quantity"] for row in month} == expected
+
+    chart = await server.get_top_products(period="all", current_user=None)
+    assert sorted(chart["values"], reverse=True) == chart["values"]
+    assert sum(chart["values"]) == sum(expected.values())
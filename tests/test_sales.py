@@ -0,0 +1,125 @@
+from types import SimpleNamespace
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClientSession
+from pymongo.errors import OperationFailure
+
+import server
+
+WRITE_CONFLICT = {"errmsg": "WriteConflict", "code": 112, "errorLabels": ["TransientTransactionError"]}
+
+
+class FakeCollection:
+    def __init__(self, name, calls, failures):
+        self.name = name
+        self.calls = calls
+        self.failures = failures
+
+    def __getattr__(self, method):
+        async def call(*args, **kwargs):
+            self.calls.append((self.name, method, kwargs.get("session") is not None))
+            failure = self.failures.get((self.name, method))
+            if failure:
+                raise failure.pop(0)
+            return SimpleNamespace(matched_count=len(args[0]) if method == "bulk_write" else 1)
+        return call
+
+
+class FakeDB:
+    def __init__(self, failures=None):
+        self.calls = []
+        self.failures = failures or {}
+
+    def __getattr__(self, name):
+        return FakeCollection(name, self.calls, self.failures)
+
+
+class FakeSession:
+    # Motor's own with_transaction drives the retries against this session
+    with_transaction = AsyncIOMotorClientSession.with_transaction
+
+    def __init__(self):
+        self.in_transaction = False
+        self.started = 0
+        self.commits = 0
+        self.aborts = 0
+
+    def start_transaction(self, *args):
+        session = self
+
+        class Transaction:
+            async def __aenter__(self):
+                session.in_transaction = True
+                session.started += 1
+
+            async def __aexit__(self, *exc):
+                pass
+
+        return Transaction()
+
+    async def commit_transaction(self):
+        self.in_transaction = False
+        self.commits += 1
+
+    async def abort_transaction(self):
+        self.in_transaction = False
+        self.aborts += 1
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+
+class FakeClient:
+    def __init__(self):
+        self.session = FakeSession()
+
+    async def start_session(self):
+        return self.session
+
+
+def make_sale():
+    detail = server.SaleDetail(product_id="p1", product_name="Paracetamol", quantity=2, unit_price=1.5, subtotal=3.0)
+    sale = server.Sale(user_id="u1", user_name="Admin", details=[detail], subtotal=3.0, total=3.0,
+                       payment_method="efectivo")
+    return sale.model_dump(), [{"id": "m1", "product_id": "p1"}], [detail]
+
+
+@pytest.fixture
+def transactional(monkeypatch):
+    def install(failures=None):
+        fake_db, fake_client = FakeDB(failures), FakeClient()
+        monkeypatch.setattr(server, "db", fake_db)
+        monkeypatch.setattr(server, "client", fake_client)
+        monkeypatch.setattr(server, "use_transactions", True)
+        return fake_db, fake_client.session
+    return install
+
+
+@pytest.mark.anyio
+async def test_sale_transaction_is_retried_after_write_conflict(transactional):
+    fake_db, session = transactional({("sales", "insert_one"): [OperationFailure("WriteConflict", 112, WRITE_CONFLICT)]})
+
+    await server.save_sale(*make_sale())
+
+    assert (session.started, session.aborts, session.commits) == (2, 1, 1)
+    in_transaction = [(name, method) for name, method, with_session in fake_db.calls if with_session]
+    assert in_transaction == [("products", "bulk_write"), ("sales", "insert_one")] * 2 + \
+        [("inventory_movements", "insert_many")]
+    # The products version and the rollups are updated once, after the commit
+    after_commit = [name for name, _, _ in fake_db.calls[len(in_transaction):]]
+    assert after_commit.count("collection_versions") == 1
+    assert after_commit.count("daily_sales") == 1
+
+
+@pytest.mark.anyio
+async def test_sale_transaction_error_without_label_is_not_retried(transactional):
+    fake_db, session = transactional({("sales", "insert_one"): [OperationFailure("Unauthorized", 13)]})
+
+    with pytest.raises(OperationFailure):
+        await server.save_sale(*make_sale())
+
+    assert (session.started, session.aborts, session.commits) == (1, 1, 0)
+    assert {"collection_versions", "daily_sales"}.isdisjoint(name for name, _, _ in fake_db.calls)